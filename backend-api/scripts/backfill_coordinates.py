@@ -0,0 +1,69 @@
+"""One-shot migration: add latitude / longitude to the listings of an existing properties JSON file.
+
+Listings without coordinates never match a geo query (lat/lon, radius_km,
+bbox, sort_by=distance). Coordinates come from the table below; listings
+that already have them are left alone, and any others are reported.
+
+Usage (from backend-api/):
+    python scripts/backfill_coordinates.py [path/to/properties.json]
+"""
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from services.geo_index import coordinates
+
+# Property id -> (latitude, longitude) of the listing's address
+KNOWN_COORDINATES = {
+    'jacob-schorerlaan-201': (52.0678, 4.2958),
+    'groenewegje-76': (52.0757, 4.3164),
+    'westeinde-11-d': (52.0760, 4.3055),
+}
+
+
+def with_coordinates(property_data, lat, lon):
+    """Copy of property_data with latitude/longitude placed after neighborhood, as new listings have them"""
+    updated = {}
+    for key, value in property_data.items():
+        if key in ('latitude', 'longitude'):
+            continue
+        updated[key] = value
+        if key == 'neighborhood':
+            updated['latitude'] = lat
+            updated['longitude'] = lon
+    updated.setdefault('latitude', lat)
+    updated.setdefault('longitude', lon)
+    return updated
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('src', 'data', 'properties.json')
+
+    with open(path, 'r') as f:
+        properties = json.load(f)
+
+    filled, missing = 0, []
+    for i, p in enumerate(properties):
+        if coordinates(p) is not None:
+            continue
+        known = KNOWN_COORDINATES.get(p.get('id'))
+        if known is None:
+            missing.append(p.get('id'))
+            continue
+        properties[i] = with_coordinates(p, *known)
+        filled += 1
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(properties, f, indent=2)
+    os.replace(tmp_path, path)
+
+    print(f"Added coordinates to {filled} of {len(properties)} properties in {path}")
+    if missing:
+        print(f"No coordinates known for: {', '.join(str(i) for i in missing)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""One-shot migration: add price_eur / price_condition to an existing properties JSON file.
+
+Usage (from backend-api/):
+    python scripts/backfill_price_eur.py [path/to/properties.json]
+"""
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from services.property_fields import normalize_property
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('src', 'data', 'properties.json')
+
+    with open(path, 'r') as f:
+        properties = json.load(f)
+
+    unparsed = []
+    for p in properties:
+        normalize_property(p)
+        if p['price_eur'] is None:
+            unparsed.append(p.get('id'))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(properties, f, indent=2)
+    os.replace(tmp_path, path)
+
+    print(f"Backfilled {len(properties)} properties in {path}")
+    if unparsed:
+        print(f"Could not parse a price for: {', '.join(str(i) for i in unparsed)}")
+
+
+if __name__ == '__main__':
+    main()
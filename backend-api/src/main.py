@@ -1,7 +1,5 @@
 import os
 import sys
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 import datetime
 import json
@@ -17,7 +15,11 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from routes.contact import contact_bp
 from routes.properties import properties_bp
-from routes.user import user_bp
+from routes.user import user_bp, view_buffer
+from services.compression import enable_compression
+from services.db_pool import pool_stats, DatabaseUnavailable
+from services.readiness import readiness
+from services.migrations import migrate
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'fallback-secret-key')
@@ -37,18 +39,8 @@ CORS(app, origins=[
     'https://api.glodinasmakelaardij.nl'
 ], supports_credentials=True)
 
-# Database connection
-def get_db_connection():
-    """Get database connection to Neon.tech PostgreSQL"""
-    try:
-        conn = psycopg2.connect(
-            os.getenv('NEON_DATABASE_URL'),
-            cursor_factory=RealDictCursor
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        return None
+# br/gzip response compression, negotiated per request
+enable_compression(app)
 
 # Custom JSON encoder for datetime objects
 class CustomJSONEncoder(json.JSONEncoder):
@@ -61,122 +53,15 @@ app.json_encoder = CustomJSONEncoder
 
 # Initialize database tables
 def init_db():
-    """Initialize database tables if they don't exist"""
-    conn = get_db_connection()
-    if not conn:
-        print("Could not connect to database for initialization")
-        return
-    
-    try:
-        cur = conn.cursor()
-        
-        # Create contacts table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS contacts (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                phone VARCHAR(50),
-                inquiry_type VARCHAR(100),
-                property_type VARCHAR(100),
-                budget_range VARCHAR(100),
-                preferred_contact VARCHAR(50),
-                message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status VARCHAR(50) DEFAULT 'new'
-            )
-        ''')
-        
-        # Create properties table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS properties (
-                id SERIAL PRIMARY KEY,
-                title VARCHAR(255) NOT NULL,
-                description TEXT,
-                price DECIMAL(12,2),
-                location VARCHAR(255),
-                bedrooms INTEGER,
-                bathrooms INTEGER,
-                area DECIMAL(10,2),
-                property_type VARCHAR(100),
-                status VARCHAR(50) DEFAULT 'available',
-                images TEXT[], -- Array of image URLs
-                features TEXT[], -- Array of features
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create users table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(80) UNIQUE NOT NULL,
-                email VARCHAR(120) UNIQUE NOT NULL,
-                password_hash VARCHAR(256) NOT NULL,
-                first_name VARCHAR(50),
-                last_name VARCHAR(50),
-                phone VARCHAR(20),
-                profile_image VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP,
-                is_active BOOLEAN DEFAULT TRUE,
-                is_verified BOOLEAN DEFAULT FALSE,
-                verification_token VARCHAR(100),
-                reset_token VARCHAR(100),
-                reset_token_expiry TIMESTAMP,
-                notification_preferences JSONB DEFAULT '{"email_alerts": true, "property_updates": true, "saved_search_alerts": true, "marketing": false}'
-            )
-        ''')
-        
-        # Create saved_properties table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS saved_properties (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                property_id INTEGER REFERENCES properties(id) ON DELETE CASCADE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                notes TEXT,
-                UNIQUE(user_id, property_id)
-            )
-        ''')
-        
-        # Create saved_searches table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS saved_searches (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                name VARCHAR(100) NOT NULL,
-                search_criteria JSONB NOT NULL,
-                alert_frequency VARCHAR(20) DEFAULT 'daily',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_alert_sent TIMESTAMP
-            )
-        ''')
-        
-        # Create property_views table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS property_views (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
-                property_id INTEGER REFERENCES properties(id) ON DELETE CASCADE,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                source VARCHAR(50),
-                session_id VARCHAR(100)
-            )
-        ''')
-        
-        conn.commit()
-        print("Database tables initialized successfully")
-        
-    except Exception as e:
-        print(f"Database initialization error: {e}")
-        conn.rollback()
-    finally:
-        cur.close()
-        conn.close()
+    """Bring the database schema up to date (see services/migrations.py)"""
+    migrate()
+
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(e):
+    """Fail fast with 503 while the database circuit breaker is open"""
+    response = jsonify({'error': 'Database temporarily unavailable'})
+    response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.999)))
+    return response, 503
 
 # Register blueprints
 app.register_blueprint(contact_bp, url_prefix='/api/contact')
@@ -199,16 +84,35 @@ def home():
 
 @app.route('/health')
 def health_check():
-    """Health check endpoint"""
-    db_status = "connected" if get_db_connection() else "disconnected"
+    """Liveness check: the process is up and serving requests. Does no I/O."""
     return jsonify({
         'status': 'healthy',
-        'database': db_status,
-        'timestamp': str(os.popen('date').read().strip())
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat()
     })
 
+@app.route('/ready')
+def readiness_check():
+    """Readiness check: a pooled SELECT 1, cached for READY_CACHE_SECONDS"""
+    ok, error, checked_at, age = readiness.result()
+    body = {
+        'status': 'ready' if ok else 'not ready',
+        'database': 'connected' if ok else 'disconnected',
+        'checked_at': checked_at,
+        'age_seconds': age
+    }
+    if error:
+        body['error'] = error
+    return jsonify(body), 200 if ok else 503
+
+@app.route('/db-pool-stats')
+def db_pool_stats():
+    """Expose database connection pool counters"""
+    stats = pool_stats() or {}
+    stats['property_view_buffer'] = view_buffer.stats()
+    return jsonify(stats), 200
+
 if __name__ == '__main__':
-    # Initialize database on startup
+    # Apply pending schema migrations; a single version check when current
     init_db()
     
     # Run the app
@@ -2,26 +2,13 @@ import os
 import requests
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
+from services.db_pool import get_db_connection, close_connection, DatabaseUnavailable
 
 load_dotenv()
 
 contact_bp = Blueprint('contact', __name__)
 
-def get_db_connection():
-    """Get database connection"""
-    try:
-        conn = psycopg2.connect(
-            os.getenv('NEON_DATABASE_URL'),
-            cursor_factory=RealDictCursor
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        return None
-
 def send_email_via_mailtrap(contact_data):
     """Send email notification via Mailtrap API with professional template"""
     try:
@@ -301,6 +288,7 @@ def submit_contact():
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
         
+        cur = None
         try:
             cur = conn.cursor()
             cur.execute('''
@@ -329,8 +317,7 @@ def submit_contact():
             conn.rollback()
             return jsonify({'error': 'Failed to save contact'}), 500
         finally:
-            cur.close()
-            conn.close()
+            close_connection(conn, cur)
         
         # Send email notification via Mailtrap
         email_sent = send_email_via_mailtrap(data)
@@ -344,6 +331,8 @@ def submit_contact():
             'email_service': 'Mailtrap.io'
         }), 200
         
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         print(f"Contact submission error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -351,7 +340,10 @@ def submit_contact():
 @contact_bp.route('/test', methods=['GET'])
 def test_contact():
     """Test endpoint for contact functionality"""
-    db_connected = get_db_connection() is not None
+    conn = get_db_connection()
+    db_connected = conn is not None
+    if conn:
+        conn.close()
     return jsonify({
         'message': 'Contact API is working',
         'database': 'Neon.tech PostgreSQL - Connected' if db_connected else 'Neon.tech PostgreSQL - Not connected',
@@ -366,6 +358,7 @@ def list_contacts():
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         cur.execute('SELECT * FROM contacts ORDER BY created_at DESC LIMIT 50')
@@ -381,8 +374,7 @@ def list_contacts():
         print(f"Error fetching contacts: {e}")
         return jsonify({'error': 'Failed to fetch contacts'}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 @contact_bp.route('/test-email', methods=['POST'])
 def test_email():
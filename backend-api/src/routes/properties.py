@@ -1,38 +1,84 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response, current_app, Response
 from datetime import datetime
 import json
-import os
+from services.property_catalog import PropertyCatalog, CatalogWriteError
+from services.property_storage import create_storage
+from services.property_index import (
+    filter_properties, page_properties, encode_cursor, decode_cursor, CursorError
+)
+from services.search_index import SearchIndex, rank
+from services.autocomplete import AutocompleteIndex
+from services.geo_index import GeoIndex, parse_geo, coordinate_error, with_distance, page_by_distance
+from services.property_fields import parse_fields, project
+from services.property_criteria import parse_criteria, CriteriaError
+from services.property_facets import compute_facets
+from services.http_cache import (
+    make_etag, normalized_args, not_modified, with_validators, latest_timestamp, parse_timestamp
+)
+from services.response_cache import ResponseCache
+from services.compression import CompressedBody
 
 properties_bp = Blueprint('properties', __name__)
 
 # File to store properties data
 PROPERTIES_FILE = 'data/properties.json'
 
+# Shared in-memory catalog, reloaded only when the stored data changes.
+# PROPERTIES_STORAGE selects a full-file ('json'), journaled ('journal'),
+# 'sqlite' or 'postgres' backend.
+catalog = PropertyCatalog(create_storage(PROPERTIES_FILE))
+
+# Page size for GET /properties when a cursor is given without a limit
+DEFAULT_PAGE_SIZE = 20
+
+# Listings per chunk written by the NDJSON export
+EXPORT_CHUNK_SIZE = 100
+
+# Fields every created or imported property must have
+REQUIRED_FIELDS = ['title', 'location', 'price', 'size', 'bedrooms', 'bathrooms', 'area', 'description']
+
+# Most items accepted by one POST /properties/bulk request
+BULK_MAX_ITEMS = 5000
+
+# Full-text index for /properties/search, updated by the catalog on every write
+search_index = SearchIndex()
+catalog.subscribe(search_index)
+
+# Street/location/neighborhood suggestions for /properties/autocomplete
+autocomplete_index = AutocompleteIndex()
+catalog.subscribe(autocomplete_index)
+
+# Most suggestions returned by /properties/autocomplete
+MAX_SUGGESTIONS = 20
+
+# Latitude/longitude grid for radius and bounding-box filters
+geo_index = GeoIndex()
+catalog.subscribe(geo_index)
+
+# Serialized GET /properties and /properties/<id> bodies keyed by request
+# and catalog version, each with its compressed variants; cleared by the
+# catalog on every change
+response_cache = ResponseCache()
+catalog.subscribe(response_cache)
+
 def load_properties():
-    """Load properties from JSON file"""
-    try:
-        if os.path.exists(PROPERTIES_FILE):
-            with open(PROPERTIES_FILE, 'r') as f:
-                return json.load(f)
-        return []
-    except Exception as e:
-        print(f"Error loading properties: {str(e)}")
-        return []
+    """Load properties from the in-memory catalog.
+
+    The returned list is a shared, immutable snapshot; callers that need
+    to change it must copy first.
+    """
+    return catalog.all()
 
 def save_properties(properties):
-    """Save properties to JSON file"""
+    """Replace all stored properties and refresh the in-memory catalog"""
     try:
-        os.makedirs(os.path.dirname(PROPERTIES_FILE), exist_ok=True)
-        with open(PROPERTIES_FILE, 'w') as f:
-            json.dump(properties, f, indent=2)
-        return True
-    except Exception as e:
-        print(f"Error saving properties: {str(e)}")
+        return catalog.save(properties)
+    except CatalogWriteError:
         return False
 
 # Initialize with sample data if file doesn't exist
 def initialize_sample_data():
-    if not os.path.exists(PROPERTIES_FILE):
+    if not catalog.storage.exists():
         sample_properties = [
             {
                 'id': 'jacob-schorerlaan-201',
@@ -56,6 +102,8 @@ def initialize_sample_data():
                 'status': 'new',
                 'description': 'Prachtig gerenoveerd appartement met moderne afwerking, ruime woonkamer en volledig uitgeruste keuken. Gelegen in een levendige buurt met alle voorzieningen binnen handbereik.',
                 'neighborhood': 'Groente- en Fruitmarkt',
+                'latitude': 52.0678,
+                'longitude': 4.2958,
                 'yearBuilt': 1920,
                 'plotSize': 0,
                 'heating': 'Centrale verwarming',
@@ -85,6 +133,8 @@ def initialize_sample_data():
                 'status': 'under_offer',
                 'description': 'Karakteristiek appartement in het historische centrum van Den Haag met uitzicht op de gracht. Hoge plafonds, originele details en moderne voorzieningen maken dit een unieke woonkans.',
                 'neighborhood': 'Centrum',
+                'latitude': 52.0757,
+                'longitude': 4.3164,
                 'yearBuilt': 1890,
                 'plotSize': 0,
                 'heating': 'Centrale verwarming',
@@ -114,6 +164,8 @@ def initialize_sample_data():
                 'status': 'available',
                 'description': 'Modern appartement in het bruisende centrum van Den Haag. Volledig gerenoveerd met hoogwaardige materialen en voorzien van een ruim balkon met uitzicht over de stad.',
                 'neighborhood': 'Centrum',
+                'latitude': 52.0760,
+                'longitude': 4.3055,
                 'yearBuilt': 1960,
                 'plotSize': 0,
                 'heating': 'Centrale verwarming',
@@ -132,9 +184,8 @@ initialize_sample_data()
 def get_properties():
     """Get all properties with optional filtering"""
     try:
-        properties = load_properties()
-        
-        # Get query parameters for filtering
+        # Get query parameters for filtering; invalid ones are rejected
+        # before any cached or 304 response could be served for them
         location = request.args.get('location', '').lower()
         min_price = request.args.get('min_price', type=int)
         max_price = request.args.get('max_price', type=int)
@@ -142,40 +193,87 @@ def get_properties():
         property_type = request.args.get('property_type', '').lower()
         status = request.args.get('status', '').lower()
         sort_by = request.args.get('sort_by', 'newest')
-        
-        # Apply filters
-        filtered_properties = properties.copy()
-        
-        if location:
-            filtered_properties = [p for p in filtered_properties if location in p['location'].lower()]
-        
-        if min_price:
-            filtered_properties = [p for p in filtered_properties if extract_price(p['price']) >= min_price]
-        
-        if max_price:
-            filtered_properties = [p for p in filtered_properties if extract_price(p['price']) <= max_price]
-        
-        if bedrooms:
-            filtered_properties = [p for p in filtered_properties if p['bedrooms'] >= bedrooms]
-        
-        if status:
-            filtered_properties = [p for p in filtered_properties if p['status'] == status]
-        
-        # Apply sorting
-        if sort_by == 'price_asc':
-            filtered_properties.sort(key=lambda x: extract_price(x['price']))
-        elif sort_by == 'price_desc':
-            filtered_properties.sort(key=lambda x: extract_price(x['price']), reverse=True)
-        elif sort_by == 'area_asc':
-            filtered_properties.sort(key=lambda x: x['area'])
-        elif sort_by == 'area_desc':
-            filtered_properties.sort(key=lambda x: x['area'], reverse=True)
-        elif sort_by == 'newest':
-            filtered_properties.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        
-        return jsonify({
-            'properties': filtered_properties,
-            'total': len(filtered_properties),
+        limit = request.args.get('limit')
+        cursor = request.args.get('cursor')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if limit <= 0:
+                return jsonify({'error': 'limit must be a positive integer'}), 400
+        
+        # Apply filters and sorting; the same filter keys work here, in
+        # search and in saved searches
+        try:
+            criteria = parse_criteria(request.args)
+            geo = parse_geo(request.args)
+        except CriteriaError as e:
+            return jsonify({'error': str(e)}), 400
+        if sort_by == 'distance' and (geo is None or geo.center is None):
+            return jsonify({'error': 'sort_by=distance requires lat and lon'}), 400
+        try:
+            after = decode_cursor(cursor, sort_by) if cursor else None
+        except CursorError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        snapshot = catalog.snapshot()
+        properties = snapshot.properties
+        
+        # Sparse fieldset, e.g. fields=card or fields=id,title,price
+        fields = parse_fields(request.args.getlist('fields'))
+        
+        # The response depends only on the stored data, the query string and
+        # the projection (normalized, so fields=title,id equals fields=id,title)
+        args = tuple(item for item in normalized_args() if item[0] != 'fields')
+        etag = make_etag('properties', snapshot.token, args, fields)
+        if not_modified(etag):
+            return with_validators(make_response('', 304), etag)
+        
+        cache_key = ('properties', snapshot.version, args, fields)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            body, last_modified = cached
+            response = body.apply(current_app.response_class(mimetype='application/json'))
+            return with_validators(response, etag, last_modified), 200
+        
+        # {property_id: distance_km} of the listings inside the geo filter
+        distances = geo_index.search(geo) if geo else None
+        
+        next_cursor = None
+        if limit is None and cursor is None:
+            if sort_by == 'distance':
+                filtered_properties = filter_properties(properties, criteria, candidates=distances)
+                filtered_properties.sort(key=lambda p: distances[p['id']])
+            else:
+                filtered_properties = filter_properties(properties, criteria, sort_by, candidates=distances)
+            total = len(filtered_properties)
+        else:
+            # Keyset pagination: the cursor carries the last row's sort value
+            # and id, so any page costs the same as the first one
+            if limit is None:
+                limit = DEFAULT_PAGE_SIZE
+            if sort_by == 'distance':
+                matches = filter_properties(properties, criteria, candidates=distances)
+                try:
+                    filtered_properties, total, has_more = page_by_distance(matches, distances, limit, after)
+                except CursorError as e:
+                    return jsonify({'error': str(e)}), 400
+            elif distances is None and getattr(catalog.storage, 'supports_query', False):
+                # SQL backends run the page query on their indexes
+                filtered_properties, total, has_more = catalog.storage.query(criteria, sort_by, limit, after)
+            else:
+                filtered_properties, total, has_more = page_properties(
+                    properties, criteria, sort_by, limit, after, candidates=distances)
+            if has_more:
+                next_cursor = encode_cursor(sort_by, with_distance(filtered_properties[-1], distances))
+        
+        last_modified = latest_timestamp(filtered_properties)
+        response = jsonify({
+            'properties': [with_distance(project(p, fields), distances) for p in filtered_properties],
+            'total': total,
+            'limit': limit,
+            'next_cursor': next_cursor,
             'filters_applied': {
                 'location': location,
                 'min_price': min_price,
@@ -183,25 +281,96 @@ def get_properties():
                 'bedrooms': bedrooms,
                 'property_type': property_type,
                 'status': status,
+                'geo': geo._asdict() if geo else None,
                 'sort_by': sort_by
             }
-        }), 200
+        })
+        body = CompressedBody(response.get_data())
+        response_cache.put(cache_key, (body, last_modified), len(body.data))
+        return with_validators(body.apply(response), etag, last_modified), 200
         
     except Exception as e:
         print(f"Error fetching properties: {str(e)}")
         return jsonify({'error': 'Failed to fetch properties'}), 500
 
+@properties_bp.route('/properties/autocomplete', methods=['GET'])
+def autocomplete_properties():
+    """Type-ahead suggestions (street names, locations, neighborhoods) for a prefix"""
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    if limit <= 0:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    suggestions = autocomplete_index.complete(prefix, min(limit, MAX_SUGGESTIONS))
+    return jsonify({'query': prefix, 'suggestions': suggestions}), 200
+
+@properties_bp.route('/properties/facets', methods=['GET'])
+def get_property_facets():
+    """Counts per neighborhood, energy label, status, bedroom bucket and price band.
+
+    Takes the same filter parameters as GET /properties and counts the
+    listings matching them, so the filter sidebar does not have to fetch
+    every listing.
+    """
+    try:
+        try:
+            criteria = parse_criteria(request.args)
+            geo = parse_geo(request.args)
+        except CriteriaError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        snapshot = catalog.snapshot()
+        
+        args = normalized_args()
+        etag = make_etag('facets', snapshot.token, args)
+        if not_modified(etag):
+            return with_validators(make_response('', 304), etag)
+        
+        cache_key = ('facets', snapshot.version, args)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            body, _ = cached
+            response = body.apply(current_app.response_class(mimetype='application/json'))
+            return with_validators(response, etag), 200
+        
+        candidates = geo_index.search(geo) if geo else None
+        facets, total = compute_facets(snapshot.properties, criteria, candidates)
+        body = CompressedBody(jsonify({'facets': facets, 'total': total}).get_data())
+        response_cache.put(cache_key, (body, None), len(body.data))
+        response = body.apply(current_app.response_class(mimetype='application/json'))
+        return with_validators(response, etag), 200
+        
+    except Exception as e:
+        print(f"Error computing property facets: {str(e)}")
+        return jsonify({'error': 'Failed to compute facets'}), 500
+
 @properties_bp.route('/properties/<property_id>', methods=['GET'])
 def get_property(property_id):
     """Get a specific property by ID"""
     try:
-        properties = load_properties()
-        property_data = next((p for p in properties if p['id'] == property_id), None)
+        snapshot = catalog.snapshot()
+        property_data = snapshot.by_id.get(property_id)
         
         if not property_data:
             return jsonify({'error': 'Property not found'}), 404
         
-        return jsonify(property_data), 200
+        fields = parse_fields(request.args.getlist('fields'))
+        etag = make_etag('property', property_id, property_data.get('version', 0),
+                         property_data.get('updated_at'), fields)
+        if not_modified(etag):
+            return with_validators(make_response('', 304), etag)
+        
+        last_modified = parse_timestamp(property_data.get('updated_at'))
+        cache_key = ('property', snapshot.version, property_id, fields)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            body, last_modified = cached
+            response = body.apply(current_app.response_class(mimetype='application/json'))
+            return with_validators(response, etag, last_modified), 200
+        
+        body = CompressedBody(jsonify(project(property_data, fields)).get_data())
+        response_cache.put(cache_key, (body, last_modified), len(body.data))
+        response = body.apply(current_app.response_class(mimetype='application/json'))
+        return with_validators(response, etag, last_modified), 200
         
     except Exception as e:
         print(f"Error fetching property {property_id}: {str(e)}")
@@ -213,72 +382,107 @@ def create_property():
     try:
         data = request.get_json()
         
-        # Validate required fields
-        required_fields = ['title', 'location', 'price', 'size', 'bedrooms', 'bathrooms', 'area', 'description']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Missing required field: {field}'}), 400
+        error = validate_property(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        properties = load_properties()
+        prepare_new_property(data)
         
-        # Generate ID if not provided
-        if not data.get('id'):
-            data['id'] = generate_id(data['title'])
-        
-        # Check if ID already exists
-        if any(p['id'] == data['id'] for p in properties):
+        # Duplicate check and insert happen atomically under the catalog write lock
+        if not catalog.add(data):
             return jsonify({'error': 'Property with this ID already exists'}), 400
         
-        # Add timestamps
-        data['created_at'] = datetime.now().isoformat()
-        data['updated_at'] = datetime.now().isoformat()
-        
-        # Set defaults
-        data.setdefault('features', [])
-        data.setdefault('images', [])
-        data.setdefault('rating', 5)
-        data.setdefault('status', 'available')
-        data.setdefault('energyLabel', 'A')
-        data.setdefault('yearBuilt', datetime.now().year)
-        data.setdefault('plotSize', 0)
-        data.setdefault('heating', '')
-        data.setdefault('parking', '')
-        data.setdefault('garden', '')
-        data.setdefault('neighborhood', '')
-        data.setdefault('mainImage', '/images/properties/default.jpg')
-        
-        properties.append(data)
-        
-        if save_properties(properties):
-            return jsonify(data), 201
-        else:
-            return jsonify({'error': 'Failed to save property'}), 500
+        return jsonify(data), 201
         
+    except CatalogWriteError:
+        return jsonify({'error': 'Failed to save property'}), 500
     except Exception as e:
         print(f"Error creating property: {str(e)}")
         return jsonify({'error': 'Failed to create property'}), 500
 
+@properties_bp.route('/properties/bulk', methods=['POST'])
+def bulk_upsert_properties():
+    """Create or update many properties at once, persisted in a single write.
+
+    The body is a JSON array of properties or NDJSON (one property per
+    line). Each item is validated like POST /properties; items with an id
+    that already exists are merged into the stored property like PUT.
+    Invalid items are reported and skipped, the valid ones are saved.
+    """
+    try:
+        items = parse_bulk_body()
+        if items is None:
+            return jsonify({'error': 'Body must be a JSON array or NDJSON'}), 400
+        if len(items) > BULK_MAX_ITEMS:
+            return jsonify({'error': f'At most {BULK_MAX_ITEMS} items per request'}), 400
+        
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            error = item if isinstance(item, str) else validate_property(item)
+            if error:
+                results[index] = {'index': index, 'status': 'error', 'error': error}
+                continue
+            if not item.get('id'):
+                item['id'] = generate_id(item['title'])
+            valid.append((index, item))
+        
+        def apply(existing, item):
+            if existing is None:
+                return prepare_new_property(dict(item))
+            updated = dict(existing)
+            updated.update(item)
+            updated['updated_at'] = datetime.now().isoformat()
+            return updated
+        
+        stored = catalog.upsert_many([item for _, item in valid], apply)
+        for (index, _), (property_data, created) in zip(valid, stored):
+            results[index] = {
+                'index': index,
+                'id': property_data['id'],
+                'status': 'created' if created else 'updated'
+            }
+        
+        return jsonify({
+            'created': sum(1 for r in results if r['status'] == 'created'),
+            'updated': sum(1 for r in results if r['status'] == 'updated'),
+            'failed': sum(1 for r in results if r['status'] == 'error'),
+            'results': results
+        }), 200
+        
+    except CatalogWriteError:
+        return jsonify({'error': 'Failed to save properties'}), 500
+    except Exception as e:
+        print(f"Error importing properties: {str(e)}")
+        return jsonify({'error': 'Failed to import properties'}), 500
+
 @properties_bp.route('/properties/<property_id>', methods=['PUT'])
 def update_property(property_id):
     """Update an existing property"""
     try:
         data = request.get_json()
-        properties = load_properties()
         
-        # Find property index
-        property_index = next((i for i, p in enumerate(properties) if p['id'] == property_id), None)
+        if isinstance(data, dict) and ('latitude' in data or 'longitude' in data):
+            error = coordinate_error(data)
+            if error:
+                return jsonify({'error': error}), 400
         
-        if property_index is None:
-            return jsonify({'error': 'Property not found'}), 404
+        # Applied to the latest stored version under the catalog write lock,
+        # so concurrent updates cannot overwrite each other.
+        # The id is the index key and cannot be changed through an update.
+        def apply(existing):
+            updated = dict(existing)
+            updated.update(data)
+            updated['id'] = property_id
+            updated['updated_at'] = datetime.now().isoformat()
+            return updated
         
-        # Update property
-        properties[property_index].update(data)
-        properties[property_index]['updated_at'] = datetime.now().isoformat()
+        updated = catalog.update(property_id, apply)
         
-        if save_properties(properties):
-            return jsonify(properties[property_index]), 200
-        else:
-            return jsonify({'error': 'Failed to update property'}), 500
+        if updated is None:
+            return jsonify({'error': 'Property not found'}), 404
+        
+        return jsonify(updated), 200
         
     except Exception as e:
         print(f"Error updating property {property_id}: {str(e)}")
@@ -288,15 +492,8 @@ def update_property(property_id):
 def delete_property(property_id):
     """Delete a property"""
     try:
-        properties = load_properties()
-        
-        # Find and remove property
-        properties = [p for p in properties if p['id'] != property_id]
-        
-        if save_properties(properties):
-            return jsonify({'message': 'Property deleted successfully'}), 200
-        else:
-            return jsonify({'error': 'Failed to delete property'}), 500
+        catalog.remove(property_id)
+        return jsonify({'message': 'Property deleted successfully'}), 200
         
     except Exception as e:
         print(f"Error deleting property {property_id}: {str(e)}")
@@ -307,48 +504,58 @@ def search_properties():
     """Advanced property search with multiple criteria"""
     try:
         data = request.get_json()
-        properties = load_properties()
         
-        # Extract search criteria
+        # Extract search criteria; all of it is validated before any
+        # searching is done
         query = data.get('query', '').lower()
         filters = data.get('filters', {})
+        limit = data.get('limit')
+        offset = data.get('offset', 0)
+        sort_by = data.get('sort_by', 'relevance')
+        fields = parse_fields(data.get('fields'))
+        
+        for name, value in (('limit', limit), ('offset', offset)):
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                return jsonify({'error': f'{name} must be a non-negative integer'}), 400
+        
+        # lat/lon/radius_km/bbox in filters restrict by position
+        try:
+            criteria = parse_criteria(filters)
+            geo = parse_geo(filters)
+        except CriteriaError as e:
+            return jsonify({'error': str(e)}), 400
+        if sort_by not in ('relevance', 'distance'):
+            return jsonify({'error': 'sort_by must be relevance or distance'}), 400
+        if sort_by == 'distance' and (geo is None or geo.center is None):
+            return jsonify({'error': 'sort_by distance requires lat and lon in filters'}), 400
         
-        # Start with all properties
-        results = properties.copy()
+        properties = load_properties()
         
-        # Apply text search
-        if query:
-            results = [p for p in results if 
-                      query in p['title'].lower() or 
-                      query in p['location'].lower() or 
-                      query in p['description'].lower() or
-                      any(query in feature.lower() for feature in p['features'])]
+        # Apply text search; scores maps matching property ids to relevance
+        scores = search_index.search(query) if query else None
         
         # Apply filters
-        if filters.get('location'):
-            results = [p for p in results if filters['location'].lower() in p['location'].lower()]
-        
-        if filters.get('min_price'):
-            results = [p for p in results if extract_price(p['price']) >= filters['min_price']]
-        
-        if filters.get('max_price'):
-            results = [p for p in results if extract_price(p['price']) <= filters['max_price']]
-        
-        if filters.get('bedrooms'):
-            results = [p for p in results if p['bedrooms'] >= filters['bedrooms']]
-        
-        if filters.get('bathrooms'):
-            results = [p for p in results if p['bathrooms'] >= filters['bathrooms']]
-        
-        if filters.get('energy_label'):
-            results = [p for p in results if p['energyLabel'] == filters['energy_label']]
-        
-        if filters.get('status'):
-            results = [p for p in results if p['status'] == filters['status']]
+        distances = geo_index.search(geo) if geo else None
+        candidates = scores
+        if distances is not None:
+            candidates = distances if scores is None else {i: s for i, s in scores.items() if i in distances}
+        results = filter_properties(properties, criteria, candidates=candidates)
+        total = len(results)
+        
+        # Rank by relevance (or nearest first), only ordering the rows that
+        # end up in the page
+        end = offset + limit if limit is not None else None
+        if sort_by == 'distance':
+            results = rank(results, {i: -d for i, d in distances.items()}, end)
+        elif scores is not None:
+            results = rank(results, scores, end)
+        results = results[offset:end]
         
         return jsonify({
-            'results': results,
-            'total': len(results),
+            'results': [with_distance(project(p, fields), distances) for p in results],
+            'total': total,
+            'limit': limit,
+            'offset': offset,
             'query': query,
             'filters': filters
         }), 200
@@ -357,14 +564,114 @@ def search_properties():
         print(f"Error searching properties: {str(e)}")
         return jsonify({'error': 'Failed to search properties'}), 500
 
-def extract_price(price_string):
-    """Extract numeric price from price string like '€465.000 k.k.'"""
-    try:
-        # Remove € symbol, dots, and text, then convert to int
-        price_clean = price_string.replace('€', '').replace('.', '').replace(' k.k.', '').replace(' v.o.n.', '')
-        return int(price_clean)
-    except:
-        return 0
+@properties_bp.route('/properties/export', methods=['GET'])
+def export_properties():
+    """Stream the catalog as NDJSON, one listing per line.
+
+    Rows are serialized while the response is being sent, so memory use
+    does not grow with the catalog size. Optional updated_since (ISO
+    timestamp or date) limits the export to listings changed since then,
+    and fields= works as on GET /properties.
+    """
+    updated_since = request.args.get('updated_since')
+    since = None
+    if updated_since:
+        since = parse_timestamp(updated_since)
+        if since is None:
+            return jsonify({'error': 'updated_since must be an ISO 8601 timestamp'}), 400
+    fields = parse_fields(request.args.getlist('fields'))
+    
+    # A snapshot is never mutated, so the stream is consistent even if
+    # writes happen while it is being sent
+    properties = catalog.all()
+    dumps = current_app.json.dumps
+    
+    def generate():
+        chunk = []
+        for p in properties:
+            if since is not None:
+                updated_at = parse_timestamp(p.get('updated_at'))
+                if updated_at is None or updated_at < since:
+                    continue
+            chunk.append(dumps(project(p, fields)) + '\n')
+            if len(chunk) >= EXPORT_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+    
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=properties.ndjson'})
+
+@properties_bp.route('/properties/cache-stats', methods=['GET'])
+def get_catalog_stats():
+    """Expose catalog and response cache counters"""
+    stats = catalog.stats()
+    stats['response_cache'] = response_cache.stats()
+    stats['geo_index'] = geo_index.stats()
+    return jsonify(stats), 200
+
+def validate_property(data):
+    """Return an error message if data is not a valid new property, else None"""
+    if not isinstance(data, dict):
+        return 'Property must be a JSON object'
+    for field in REQUIRED_FIELDS:
+        if not data.get(field):
+            return f'Missing required field: {field}'
+    # The id (or the title it is generated from) becomes the index key
+    if not isinstance(data['title'], str):
+        return 'title must be a string'
+    if data.get('id') is not None and not isinstance(data['id'], str):
+        return 'id must be a string'
+    return coordinate_error(data)
+
+def prepare_new_property(data):
+    """Fill in id, timestamps and defaults for a new property. Mutates and returns data."""
+    # Generate ID if not provided
+    if not data.get('id'):
+        data['id'] = generate_id(data['title'])
+    
+    # Add timestamps
+    data['created_at'] = datetime.now().isoformat()
+    data['updated_at'] = datetime.now().isoformat()
+    
+    # Set defaults
+    data.setdefault('features', [])
+    data.setdefault('images', [])
+    data.setdefault('rating', 5)
+    data.setdefault('status', 'available')
+    data.setdefault('energyLabel', 'A')
+    data.setdefault('yearBuilt', datetime.now().year)
+    data.setdefault('plotSize', 0)
+    data.setdefault('heating', '')
+    data.setdefault('parking', '')
+    data.setdefault('garden', '')
+    data.setdefault('neighborhood', '')
+    data.setdefault('mainImage', '/images/properties/default.jpg')
+    return data
+
+def parse_bulk_body():
+    """Items of a bulk request body: a JSON array or NDJSON.
+
+    Returns None if the body is neither. An NDJSON line that is not valid
+    JSON becomes an error message string in place of its item.
+    """
+    text = request.get_data(as_text=True)
+    if text.lstrip().startswith('['):
+        try:
+            items = json.loads(text)
+        except ValueError:
+            return None
+        return items if isinstance(items, list) else None
+    items = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            items.append(f'Invalid JSON on line {number}')
+    return items
 
 def generate_id(title):
     """Generate a URL-friendly ID from title"""
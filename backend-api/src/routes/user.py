@@ -1,7 +1,5 @@
 from flask import Blueprint, jsonify, request, current_app
 from werkzeug.security import generate_password_hash, check_password_hash
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import os
 import datetime
 import uuid
@@ -14,24 +12,20 @@ from dotenv import load_dotenv
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from services.property_criteria import parse_criteria, CriteriaError
+from services.db_pool import get_db_connection, close_connection
+from services.view_buffer import PROPERTY_VIEWS_BUFFERED, KnownPropertyIds, ViewBuffer, view_field_error
+from services.property_index import filter_many
+from routes.properties import catalog
 
 # Load environment variables
 load_dotenv()
 
 user_bp = Blueprint('user', __name__)
 
-# Database connection
-def get_db_connection():
-    """Get database connection to Neon.tech PostgreSQL"""
-    try:
-        conn = psycopg2.connect(
-            os.getenv('NEON_DATABASE_URL'),
-            cursor_factory=RealDictCursor
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        return None
+# Property views are queued here and written in batches (see track_property_view)
+known_property_ids = KnownPropertyIds()
+view_buffer = ViewBuffer()
 
 # Helper function to send emails
 def send_email(to_email, subject, html_content):
@@ -79,6 +73,7 @@ def register():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -137,8 +132,7 @@ def register():
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Email verification
 @user_bp.route('/verify-email', methods=['POST'])
@@ -152,6 +146,7 @@ def verify_email():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -182,8 +177,7 @@ def verify_email():
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # User login
 @user_bp.route('/login', methods=['POST'])
@@ -198,6 +192,7 @@ def login():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -246,8 +241,7 @@ def login():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Refresh token
 @user_bp.route('/refresh', methods=['POST'])
@@ -270,6 +264,7 @@ def get_profile():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -300,8 +295,7 @@ def get_profile():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Update user profile
 @user_bp.route('/profile', methods=['PUT'])
@@ -321,6 +315,7 @@ def update_profile():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -361,8 +356,7 @@ def update_profile():
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Change password
 @user_bp.route('/change-password', methods=['PUT'])
@@ -379,6 +373,7 @@ def change_password():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -414,8 +409,7 @@ def change_password():
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Request password reset
 @user_bp.route('/forgot-password', methods=['POST'])
@@ -429,6 +423,7 @@ def forgot_password():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -478,8 +473,7 @@ def forgot_password():
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Reset password with token
 @user_bp.route('/reset-password', methods=['POST'])
@@ -493,6 +487,7 @@ def reset_password():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -528,8 +523,7 @@ def reset_password():
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Get saved properties for current user
 @user_bp.route('/saved-properties', methods=['GET'])
@@ -541,6 +535,7 @@ def get_saved_properties():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -569,8 +564,7 @@ def get_saved_properties():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Save a property
 @user_bp.route('/saved-properties', methods=['POST'])
@@ -586,6 +580,7 @@ def save_property():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -635,8 +630,7 @@ def save_property():
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Remove a saved property
 @user_bp.route('/saved-properties/<int:property_id>', methods=['DELETE'])
@@ -648,6 +642,7 @@ def remove_saved_property(property_id):
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -672,8 +667,7 @@ def remove_saved_property(property_id):
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Get saved searches for current user
 @user_bp.route('/saved-searches', methods=['GET'])
@@ -685,6 +679,7 @@ def get_saved_searches():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -719,8 +714,59 @@ def get_saved_searches():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
+
+# Evaluate all saved searches of the current user against the catalog
+@user_bp.route('/saved-searches/matches', methods=['GET'])
+@jwt_required()
+def get_saved_search_matches():
+    current_user_id = get_jwt_identity()
+    limit = request.args.get('limit', 20, type=int)
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection error'}), 500
+    
+    cur = None
+    try:
+        cur = conn.cursor()
+        
+        cur.execute("""
+            SELECT id, name, search_criteria
+            FROM saved_searches
+            WHERE user_id = %s
+            ORDER BY created_at DESC
+        """, (current_user_id,))
+        
+        saved_searches = cur.fetchall()
+        
+        matches = []
+        evaluated = []
+        for search in saved_searches:
+            criteria = search['search_criteria']
+            if isinstance(criteria, str):
+                criteria = json.loads(criteria)
+            entry = {'search_id': search['id'], 'name': search['name']}
+            matches.append(entry)
+            try:
+                evaluated.append((entry, parse_criteria(criteria)))
+            except CriteriaError as e:
+                entry['error'] = f'Invalid search criteria: {e}'
+        
+        # All searches run against one catalog snapshot and its columnar index
+        results = filter_many(catalog.all(), [c for _, c in evaluated], sort_by='newest')
+        for (entry, _), found in zip(evaluated, results):
+            entry['total'] = len(found)
+            entry['property_ids'] = [p['id'] for p in found[:limit]]
+        
+        return jsonify({
+            'matches': matches
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        close_connection(conn, cur)
 
 # Save a search
 @user_bp.route('/saved-searches', methods=['POST'])
@@ -733,10 +779,17 @@ def save_search():
     if 'name' not in data or 'search_criteria' not in data:
         return jsonify({'error': 'Name and search criteria are required'}), 400
     
+    # Same filters as GET /api/properties/properties, validated up front
+    try:
+        parse_criteria(data['search_criteria'])
+    except CriteriaError as e:
+        return jsonify({'error': f'Invalid search criteria: {e}'}), 400
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -780,8 +833,7 @@ def save_search():
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Update a saved search
 @user_bp.route('/saved-searches/<int:search_id>', methods=['PUT'])
@@ -797,10 +849,17 @@ def update_saved_search(search_id):
     if not update_data:
         return jsonify({'error': 'No valid fields to update'}), 400
     
+    if 'search_criteria' in update_data:
+        try:
+            parse_criteria(update_data['search_criteria'])
+        except CriteriaError as e:
+            return jsonify({'error': f'Invalid search criteria: {e}'}), 400
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -861,8 +920,7 @@ def update_saved_search(search_id):
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Delete a saved search
 @user_bp.route('/saved-searches/<int:search_id>', methods=['DELETE'])
@@ -874,6 +932,7 @@ def delete_saved_search(search_id):
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -898,8 +957,7 @@ def delete_saved_search(search_id):
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Track property view
 @user_bp.route('/property-view', methods=['POST'])
@@ -910,10 +968,14 @@ def track_property_view():
     if 'property_id' not in data:
         return jsonify({'error': 'Property ID is required'}), 400
     
+    if PROPERTY_VIEWS_BUFFERED:
+        return queue_property_view(data)
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -958,8 +1020,44 @@ def track_property_view():
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
+
+def queue_property_view(data):
+    """Validate a view against the known property ids and queue it for the next batch insert"""
+    property_id = data['property_id']
+    if isinstance(property_id, bool) or not isinstance(property_id, (int, str)):
+        return jsonify({'error': 'Property ID must be an integer'}), 400
+    try:
+        property_id = int(property_id)
+    except ValueError:
+        return jsonify({'error': 'Property ID must be an integer'}), 400
+    
+    # Checked here: a row the database refuses would be dropped after the 202
+    error = view_field_error(data.get('source'), data.get('session_id'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    known = known_property_ids.contains(property_id)
+    if known is None:
+        return jsonify({'error': 'Database connection error'}), 500
+    if not known:
+        return jsonify({'error': 'Property not found'}), 404
+    
+    # Get user_id from JWT if available
+    user_id = None
+    try:
+        user_id = get_jwt_identity()
+    except:
+        pass
+    
+    row = (user_id, property_id, datetime.datetime.utcnow(), data.get('source'), data.get('session_id'))
+    if not view_buffer.offer(row):
+        # Backpressure: the database is not keeping up with the views
+        response = jsonify({'error': 'View tracking is busy, try again later'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    
+    return jsonify({'message': 'Property view queued'}), 202
 
 # Get property view statistics (admin only)
 @user_bp.route('/analytics/property-views', methods=['GET'])
@@ -971,6 +1069,7 @@ def get_property_view_stats():
     if not conn:
         return jsonify({'error': 'Database connection error'}), 500
     
+    cur = None
     try:
         cur = conn.cursor()
         
@@ -996,8 +1095,7 @@ def get_property_view_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        cur.close()
-        conn.close()
+        close_connection(conn, cur)
 
 # Logout (client-side only, just for completeness)
 @user_bp.route('/logout', methods=['POST'])
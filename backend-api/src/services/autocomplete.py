@@ -0,0 +1,162 @@
+import re
+import threading
+from collections import deque
+from services.search_index import fold
+
+# Completions remembered per trie node; larger requests are computed directly
+CACHED_COMPLETIONS = 20
+
+# A trailing house number such as '201', '11-D' or '76a' is not part of the street name
+_HOUSE_NUMBER = re.compile(r'\s+\d+[\w-]*$')
+
+
+def street_name(title):
+    """'Jacob Schorerlaan 201' -> 'Jacob Schorerlaan'"""
+    return _HOUSE_NUMBER.sub('', title).strip()
+
+
+def suggestions_for(property_data):
+    """(text, type) suggestions a property contributes"""
+    suggestions = []
+    for field, kind, extract in (('title', 'street', street_name),
+                                 ('location', 'location', str.strip),
+                                 ('neighborhood', 'neighborhood', str.strip)):
+        value = property_data.get(field)
+        if isinstance(value, str):
+            text = extract(value)
+            if text:
+                suggestions.append((text, kind))
+    return suggestions
+
+
+class _Node:
+    __slots__ = ('children', 'entries', 'completions')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = {}  # (text, type) -> number of properties
+        self.completions = None  # cached [(suggestion, count)], reset when the subtree changes
+
+
+class AutocompleteIndex:
+    """Prefix trie of street names, locations and neighborhoods for type-ahead.
+
+    Every suggestion is inserted under its folded text and under each
+    later word of it, so 'schor' finds 'Jacob Schorerlaan'. A lookup walks
+    the prefix and then collects completions breadth-first, shortest
+    first, stopping as soon as enough are found. The first
+    CACHED_COMPLETIONS results are remembered on the node, so repeated
+    keystrokes cost only the walk down the prefix. Writes clear the
+    cached results along the paths they touch. Kept in sync through the
+    PropertyCatalog listener hooks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root = _Node()
+        self._doc_suggestions = {}  # property_id -> suggestions it added
+
+    @staticmethod
+    def _keys(text):
+        words = fold(text).split()
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def _insert(self, suggestion):
+        for key in self._keys(suggestion[0]):
+            node = self._root
+            node.completions = None
+            for char in key:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _Node()
+                node = child
+                node.completions = None
+            node.entries[suggestion] = node.entries.get(suggestion, 0) + 1
+
+    def _delete(self, suggestion):
+        for key in self._keys(suggestion[0]):
+            path = [self._root]
+            for char in key:
+                node = path[-1].children.get(char)
+                if node is None:
+                    break
+                path.append(node)
+            else:
+                for node in path:
+                    node.completions = None
+                node = path[-1]
+                count = node.entries.get(suggestion, 0) - 1
+                if count > 0:
+                    node.entries[suggestion] = count
+                    continue
+                node.entries.pop(suggestion, None)
+                # Prune nodes that no longer lead to any suggestion
+                for depth in range(len(key), 0, -1):
+                    node = path[depth]
+                    if node.entries or node.children:
+                        break
+                    del path[depth - 1].children[key[depth - 1]]
+
+    def _add(self, property_data):
+        suggestions = suggestions_for(property_data)
+        for suggestion in suggestions:
+            self._insert(suggestion)
+        self._doc_suggestions[property_data['id']] = suggestions
+
+    def _remove(self, property_id):
+        for suggestion in self._doc_suggestions.pop(property_id, ()):
+            self._delete(suggestion)
+
+    # Catalog listener hooks
+
+    def reset(self, properties):
+        with self._lock:
+            self._root = _Node()
+            self._doc_suggestions = {}
+            for p in properties:
+                self._add(p)
+
+    def upsert(self, property_data):
+        with self._lock:
+            self._remove(property_data['id'])
+            self._add(property_data)
+
+    def remove(self, property_id):
+        with self._lock:
+            self._remove(property_id)
+
+    # Queries
+
+    @staticmethod
+    def _collect(node, limit):
+        found = {}
+        queue = deque([node])
+        while queue and len(found) < limit:
+            node = queue.popleft()
+            for suggestion in sorted(node.entries):
+                if suggestion not in found:
+                    found[suggestion] = node.entries[suggestion]
+                    if len(found) >= limit:
+                        break
+            for char in sorted(node.children):
+                queue.append(node.children[char])
+        return list(found.items())
+
+    def complete(self, prefix, limit=10):
+        """Up to limit suggestions starting with prefix, as dicts with text, type and count"""
+        key = ' '.join(fold(prefix).split())
+        if not key or limit <= 0:
+            return []
+        with self._lock:
+            node = self._root
+            for char in key:
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            if limit > CACHED_COMPLETIONS:
+                found = self._collect(node, limit)
+            else:
+                if node.completions is None:
+                    node.completions = self._collect(node, CACHED_COMPLETIONS)
+                found = node.completions[:limit]
+        return [{'text': text, 'type': kind, 'count': count} for (text, kind), count in found]
@@ -0,0 +1,107 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    closed: calls go through; failure_threshold failures in a row open
+    the circuit. open: calls are rejected without being attempted until
+    reset_timeout seconds have passed, then the circuit is half-open.
+    half_open: a single probe call is let through at a time (a probe that
+    never reports back is replaced after reset_timeout); its success closes
+    the circuit and its failure opens it again.
+
+    Callers ask allow() before a call and report record_success() or
+    record_failure() afterwards. State changes are logged and counted in
+    stats().
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self._changed_at = None
+        self._transitions = {}
+        self._rejected = 0
+        self._total_failures = 0
+        self._total_successes = 0
+
+    def _transition(self, state):
+        key = f'{self._state}_to_{state}'
+        self._transitions[key] = self._transitions.get(key, 0) + 1
+        print(f"Circuit breaker {self.name}: {self._state} -> {state}")
+        self._state = state
+        self._changed_at = datetime.now(timezone.utc).isoformat()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def retry_after(self):
+        """Seconds until an open circuit lets a probe through (0 if not open)"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        """Whether a call may be attempted now"""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    self._rejected += 1
+                    return False
+                self._transition(HALF_OPEN)
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                self._rejected += 1
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._total_successes += 1
+            self._failures = 0
+            # A late success from a call started before the circuit opened
+            # does not close it; only a half-open probe does
+            if self._state == HALF_OPEN:
+                self._probe_started = None
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._total_failures += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._probe_started = None
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout_seconds': self.reset_timeout,
+                'last_state_change': self._changed_at,
+                'transitions': dict(self._transitions),
+                'rejected': self._rejected,
+                'failures': self._total_failures,
+                'successes': self._total_successes,
+            }
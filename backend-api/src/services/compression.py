@@ -0,0 +1,100 @@
+import gzip
+import os
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli is optional, gzip is always available
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; the saving is not worth the CPU
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+
+# In order of preference when the client accepts several equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html', 'text/csv')
+
+
+def negotiate_encoding(size):
+    """Content-Encoding to use for a body of size bytes in this request, or None"""
+    if size < COMPRESS_MIN_BYTES or not request.accept_encodings:
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class CompressedBody:
+    """A serialized body plus its compressed variants, each produced at most once.
+
+    Meant to be stored in a cache next to data that does not change (e.g.
+    keyed by catalog version), so repeated requests reuse the compressed
+    bytes instead of compressing per request.
+    """
+
+    __slots__ = ('data', '_encoded')
+
+    def __init__(self, data):
+        self.data = data
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        """Body bytes for encoding (None for the uncompressed body)"""
+        if encoding is None:
+            return self.data
+        data = self._encoded.get(encoding)
+        if data is None:
+            # Two requests racing here both compress; either result is fine
+            data = self._encoded[encoding] = compress(self.data, encoding)
+        return data
+
+    def apply(self, response):
+        """Set response's body to the best variant the client accepts"""
+        encoding = negotiate_encoding(len(self.data))
+        response.set_data(self.encoded(encoding))
+        response.vary.add('Accept-Encoding')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def _compress_response(response):
+    if 'Content-Encoding' in response.headers:
+        encoded = True
+    else:
+        encoded = False
+        if (response.status_code == 200 and not response.direct_passthrough
+                and not response.is_streamed and response.mimetype in COMPRESSIBLE_MIMETYPES):
+            data = response.get_data()
+            response.vary.add('Accept-Encoding')
+            encoding = negotiate_encoding(len(data))
+            if encoding is not None:
+                response.set_data(compress(data, encoding))
+                response.headers['Content-Encoding'] = encoding
+                encoded = True
+    if encoded and response.headers.get('Content-Encoding') in ENCODINGS:
+        # Compressed bytes differ from the identity body, so a strong ETag
+        # computed for the data no longer applies byte-for-byte
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+    return response
+
+
+def enable_compression(app):
+    """Compress eligible responses of app with br or gzip as negotiated per request.
+
+    Responses that already carry a Content-Encoding (e.g. built from a
+    CompressedBody) are passed through.
+    """
+    app.after_request(_compress_response)
@@ -0,0 +1,488 @@
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from services.circuit_breaker import CircuitBreaker, CLOSED
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+    from psycopg2.extras import RealDictCursor
+except ImportError:  # pragma: no cover - psycopg2-binary is pinned in requirements.txt
+    psycopg2 = None
+
+# Connections opened when the pool is created, and the most it will hold open
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+
+# Connections older than this are closed instead of being reused
+DB_POOL_MAX_LIFETIME_SECONDS = float(os.getenv('DB_POOL_MAX_LIFETIME_SECONDS', '1800'))
+
+# A connection idle for longer than this is tested with SELECT 1 before it
+# is handed out (0 tests on every checkout)
+DB_POOL_HEALTH_CHECK_IDLE_SECONDS = float(os.getenv('DB_POOL_HEALTH_CHECK_IDLE_SECONDS', '5'))
+
+# How long a checkout waits for a free connection when all DB_POOL_MAX are in use
+DB_POOL_CHECKOUT_TIMEOUT_SECONDS = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT_SECONDS', '5'))
+
+# Give up opening a connection after this many seconds (psycopg2's default is to wait forever)
+DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv('DB_CONNECT_TIMEOUT_SECONDS', '5'))
+
+# Server-side limit on any single statement, set on every new connection (0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '15000'))
+
+# Consecutive connection/query failures that open the circuit, and how long
+# it stays open before a probe is let through
+DB_BREAKER_FAILURE_THRESHOLD = int(os.getenv('DB_BREAKER_FAILURE_THRESHOLD', '5'))
+DB_BREAKER_RESET_SECONDS = float(os.getenv('DB_BREAKER_RESET_SECONDS', '30'))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free within the checkout timeout"""
+
+
+class DatabaseUnavailable(Exception):
+    """Raised without touching the database while the circuit breaker is open"""
+
+    def __init__(self, retry_after):
+        super().__init__('Database temporarily unavailable')
+        self.retry_after = retry_after
+
+
+class _Entry:
+    __slots__ = ('conn', 'pid', 'created', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.pid = os.getpid()
+        self.created = self.last_used = time.monotonic()
+
+
+class _GuardedCursor:
+    """Cursor proxy reporting statement outcomes to the breaker.
+
+    Connection-level errors (and statement timeouts) count as failures and
+    every statement that completes as a success.
+    """
+
+    __slots__ = ('_pool', '_cursor')
+
+    def __init__(self, pool, cursor):
+        self._pool = pool
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
+
+    def _run(self, method, args, kwargs):
+        try:
+            result = method(*args, **kwargs)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self._pool._report(False)
+            raise
+        # A completed statement ends a run of failures, so only failures
+        # with nothing succeeding in between open the circuit
+        self._pool._report(True)
+        return result
+
+    def execute(self, *args, **kwargs):
+        return self._run(self._cursor.execute, args, kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._run(self._cursor.executemany, args, kwargs)
+
+
+class PooledConnection:
+    """A checked-out connection; close() hands it back to the pool.
+
+    Everything else is delegated to the psycopg2 connection, so code
+    written for psycopg2.connect() (cursor(), commit(), rollback(),
+    close() in a finally block) works unchanged. A connection that is
+    garbage collected without being closed is handed back by the pool on
+    a later checkout rather than holding its slot for good.
+    """
+
+    __slots__ = ('_pool', '_entry', '_finalizer', '__weakref__')
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+        # Only queues the entry: the collector may run while the pool lock is held
+        self._finalizer = weakref.finalize(self, pool._leaked.append, entry)
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise AttributeError(f'{name}: connection already returned to the pool')
+        return getattr(self._entry.conn, name)
+
+    def __enter__(self):
+        self._entry.conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._entry.conn.__exit__(*exc_info)
+
+    @property
+    def closed(self):
+        return self._entry is None or self._entry.conn.closed
+
+    def cursor(self, *args, **kwargs):
+        return _GuardedCursor(self._pool, self._entry.conn.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._finalizer.detach()
+            self._pool._checkin(entry)
+
+    def discard(self):
+        """Close the connection instead of returning it, ending its session (and session locks)"""
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._finalizer.detach()
+            self._pool._discard(entry)
+            self._pool._checkin(entry)
+
+
+class ConnectionPool:
+    """Thread-safe pool of PostgreSQL connections shared by all request handlers.
+
+    Checkout reuses an idle connection (most recently used first, after a
+    SELECT 1 if it sat idle for more than health_check_idle seconds), opens
+    a new one while fewer than maxconn exist, and otherwise waits up to
+    checkout_timeout for one to be returned. Connections are retired once
+    they are older than max_lifetime or come back broken or mid-transaction
+    with a failing rollback. Checkout wait times are counted in stats().
+
+    With a breaker, failed connects, failed health checks and connection
+    errors or timeouts raised by cursors count as failures, and successful
+    connects, health checks and statements as successes. While it is
+    open getconn() raises DatabaseUnavailable at once instead of waiting
+    on a database that is down; a half-open probe always runs the health
+    check.
+
+    After a fork the child starts with an empty pool: the inherited
+    connections share their sockets with the parent, so they are kept
+    referenced (never closed or garbage collected, which would end the
+    parent's sessions) but never used.
+    """
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 max_lifetime=DB_POOL_MAX_LIFETIME_SECONDS,
+                 health_check_idle=DB_POOL_HEALTH_CHECK_IDLE_SECONDS,
+                 checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT_SECONDS, connect=None, breaker=None):
+        if maxconn < 1 or minconn < 0 or minconn > maxconn:
+            raise ValueError('Pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1')
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.health_check_idle = health_check_idle
+        self.checkout_timeout = checkout_timeout
+        self._connect = connect or self._psycopg2_connect
+        self.breaker = breaker
+        self._reset_state()
+        self._inherited = []
+        self._prefill()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = []       # _Entry, most recently returned last
+        self._size = 0        # open connections, idle or checked out
+        self._opening = 0     # connections being opened outside the lock
+        self._leaked = deque()  # _Entry of connections collected without close()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'timeouts': 0,
+            'opened': 0,
+            'connect_errors': 0,
+            'retired_expired': 0,
+            'retired_broken': 0,
+            'reclaimed': 0,
+        }
+
+    def _psycopg2_connect(self):
+        if psycopg2 is None:
+            raise RuntimeError('psycopg2 is required for the database connection pool')
+        conn = psycopg2.connect(self.dsn, cursor_factory=RealDictCursor,
+                                connect_timeout=DB_CONNECT_TIMEOUT_SECONDS)
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            try:
+                cur = conn.cursor()
+                cur.execute('SET statement_timeout = %s', (DB_STATEMENT_TIMEOUT_MS,))
+                cur.close()
+                conn.commit()
+            except Exception:
+                conn.close()
+                raise
+        return conn
+
+    def _report(self, ok):
+        if self.breaker is not None:
+            if ok:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+    def _prefill(self):
+        for _ in range(self.minconn):
+            try:
+                conn = self._connect()
+            except Exception as e:
+                print(f"Database connection error: {e}")
+                return
+            with self._cond:
+                self._size += 1
+                self._stats['opened'] += 1
+                self._idle.append(_Entry(conn))
+
+    def _after_fork(self):
+        """Drop (but keep referenced) the parent's connections in a forked child"""
+        self._inherited.extend(entry.conn for entry in self._idle)
+        self._reset_state()
+
+    def _expired(self, entry, now):
+        return self.max_lifetime > 0 and now - entry.created >= self.max_lifetime
+
+    def _healthy(self, entry, now, force=False):
+        conn = entry.conn
+        if conn.closed:
+            return False
+        if not force and now - entry.last_used < self.health_check_idle:
+            return True
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute('SELECT 1')
+            finally:
+                cur.close()
+            conn.rollback()
+        except Exception:
+            self._report(False)
+            return False
+        self._report(True)
+        return True
+
+    def _discard(self, entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def getconn(self):
+        """Check out a connection, waiting up to checkout_timeout; returns a PooledConnection.
+
+        Raises PoolTimeout if none became free in time, or the driver's
+        error if a new connection could not be opened.
+        """
+        if os.getpid() != self._pid:
+            self._after_fork()
+        if self._leaked:
+            self._reclaim()
+        probing = False
+        if self.breaker is not None:
+            if not self.breaker.allow():
+                raise DatabaseUnavailable(self.breaker.retry_after())
+            probing = self.breaker.state != CLOSED
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                entry = None
+                while self._idle:
+                    candidate = self._idle.pop()
+                    if self._expired(candidate, now):
+                        self._size -= 1
+                        self._stats['retired_expired'] += 1
+                        self._discard(candidate)
+                        continue
+                    entry = candidate
+                    break
+                if entry is not None or self._size + self._opening < self.maxconn:
+                    break
+                remaining = started + self.checkout_timeout - now
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'No database connection free after {self.checkout_timeout}s')
+                waited = True
+                self._cond.wait(remaining)
+            if entry is None:
+                self._opening += 1
+            self._record_checkout(started, waited)
+
+        if entry is not None:
+            # Health check outside the lock; a dead connection is replaced
+            if self._healthy(entry, time.monotonic(), force=probing):
+                entry.last_used = time.monotonic()
+                return PooledConnection(self, entry)
+            self._discard(entry)
+            with self._cond:
+                self._size -= 1
+                self._stats['retired_broken'] += 1
+                self._opening += 1
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._stats['connect_errors'] += 1
+                self._cond.notify()
+            self._report(False)
+            raise
+        self._report(True)
+        with self._cond:
+            self._opening -= 1
+            self._size += 1
+            self._stats['opened'] += 1
+        return PooledConnection(self, _Entry(conn))
+
+    def _reclaim(self):
+        """Check in the connections whose PooledConnection was dropped without close()"""
+        while True:
+            try:
+                entry = self._leaked.popleft()
+            except IndexError:
+                return
+            print("Database connection was not closed; returning it to the pool")
+            with self._cond:
+                self._stats['reclaimed'] += 1
+            self._checkin(entry)
+
+    def _record_checkout(self, started, waited):
+        stats = self._stats
+        stats['checkouts'] += 1
+        if waited:
+            wait = time.monotonic() - started
+            stats['waits'] += 1
+            stats['wait_seconds_total'] += wait
+            stats['wait_seconds_max'] = max(stats['wait_seconds_max'], wait)
+
+    def _checkin(self, entry):
+        if entry.pid != os.getpid():
+            # Checked out before a fork; the parent still owns the socket
+            self._inherited.append(entry.conn)
+            return
+        conn = entry.conn
+        reusable = not conn.closed
+        if reusable and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            # Left mid-transaction (e.g. by an exception); reset before reuse
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+        now = time.monotonic()
+        expired = reusable and self._expired(entry, now)
+        if not reusable or expired:
+            self._discard(entry)
+        with self._cond:
+            if not reusable or expired:
+                self._size -= 1
+                self._stats['retired_expired' if expired else 'retired_broken'] += 1
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+            self._cond.notify()
+
+    def closeall(self):
+        """Close the idle connections; checked-out ones are closed when returned"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min': self.minconn,
+                'max': self.maxconn,
+            })
+        stats['wait_seconds_total'] = round(stats['wait_seconds_total'], 6)
+        stats['wait_seconds_max'] = round(stats['wait_seconds_max'], 6)
+        if self.breaker is not None:
+            stats['breaker'] = self.breaker.stats()
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool for NEON_DATABASE_URL, created on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    os.getenv('NEON_DATABASE_URL'),
+                    breaker=CircuitBreaker('database', DB_BREAKER_FAILURE_THRESHOLD, DB_BREAKER_RESET_SECONDS))
+    return _pool
+
+
+def _reinit_after_fork():
+    # The pool lock may have been held by another thread at fork time
+    global _pool_lock
+    _pool_lock = threading.Lock()
+    if _pool is not None:
+        _pool._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+def get_db_connection():
+    """Check out a pooled connection to Neon.tech PostgreSQL (RealDictCursor rows).
+
+    Callers close() it as before, which returns it to the pool. Returns
+    None if no connection could be obtained, and raises DatabaseUnavailable
+    (answered with a 503 by the app's error handler) while the circuit
+    breaker is open.
+    """
+    try:
+        return get_pool().getconn()
+    except DatabaseUnavailable:
+        raise
+    except Exception as e:
+        print(f"Database connection error: {e}")
+        return None
+
+
+def close_connection(conn, cur=None):
+    """Close cur, if one was opened, and return conn to the pool.
+
+    conn is returned even if closing cur fails, so a request that fails
+    half-way cannot keep its pool slot.
+    """
+    try:
+        if cur is not None:
+            cur.close()
+    finally:
+        conn.close()
+
+
+def pool_stats():
+    """Pool counters, or None if no connection has been requested yet"""
+    return _pool.stats() if _pool is not None else None
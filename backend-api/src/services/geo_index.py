@@ -0,0 +1,305 @@
+import math
+import os
+import threading
+from collections import namedtuple
+from services.property_criteria import CriteriaError
+from services.property_index import CursorError
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is pinned in requirements.txt
+    np = None
+
+# Grid cell size in degrees; 0.01 is about 1.1 km north-south in the Netherlands
+GEO_CELL_DEGREES = float(os.getenv('PROPERTIES_GEO_CELL_DEGREES', '0.01'))
+
+# Largest radius accepted by radius_km
+MAX_RADIUS_KM = 500
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Distances are reported (and sorted on) in whole metres
+DISTANCE_DECIMALS = 3
+
+
+def coordinates(property_data):
+    """(latitude, longitude) of a property, or None if it has no valid position"""
+    lat = property_data.get('latitude')
+    lon = property_data.get('longitude')
+    for value in (lat, lon):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isnan(value):
+            return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return float(lat), float(lon)
+
+
+def coordinate_error(data):
+    """Error message if data carries an invalid latitude/longitude pair, else None.
+
+    Both fields are optional, but they must be given together.
+    """
+    has_lat = data.get('latitude') is not None
+    has_lon = data.get('longitude') is not None
+    if not has_lat and not has_lon:
+        return None
+    if has_lat != has_lon:
+        return 'latitude and longitude must be given together'
+    if coordinates(data) is None:
+        return 'latitude must be between -90 and 90 and longitude between -180 and 180'
+    return None
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from (lat, lon) to each point of the lats/lons arrays"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _haversine_one(lat, lon, lat2, lon2):
+    lat1 = math.radians(lat)
+    lat2 = math.radians(lat2)
+    dlon = math.radians(lon2 - lon)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+# A parsed geo filter. center is (lat, lon) or None, radius_km is None
+# without a radius and bbox is (south, west, north, east) or None.
+GeoQuery = namedtuple('GeoQuery', ('center', 'radius_km', 'bbox'))
+
+
+def _to_float(key, value):
+    if isinstance(value, bool):
+        raise CriteriaError(f'{key} must be a number')
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise CriteriaError(f'{key} must be a number')
+    if math.isnan(value) or math.isinf(value):
+        raise CriteriaError(f'{key} must be a number')
+    return value
+
+
+def parse_geo(filters):
+    """Build a GeoQuery from query args or a search filters mapping, or None without geo keys.
+
+    Keys: lat and lon (a point, needed for radius_km and for sorting by
+    distance), radius_km, and bbox as 'south,west,north,east' or a list of
+    four numbers. Raises CriteriaError for invalid values.
+    """
+    if not hasattr(filters, 'get'):
+        return None
+    lat, lon = filters.get('lat'), filters.get('lon')
+    radius, bbox = filters.get('radius_km'), filters.get('bbox')
+    if all(value is None or value == '' for value in (lat, lon, radius, bbox)):
+        return None
+
+    center = None
+    if lat not in (None, '') or lon not in (None, ''):
+        if lat in (None, '') or lon in (None, ''):
+            raise CriteriaError('lat and lon must be given together')
+        center = (_to_float('lat', lat), _to_float('lon', lon))
+        if not (-90 <= center[0] <= 90 and -180 <= center[1] <= 180):
+            raise CriteriaError('lat must be between -90 and 90 and lon between -180 and 180')
+
+    radius_km = None
+    if radius not in (None, ''):
+        if center is None:
+            raise CriteriaError('radius_km requires lat and lon')
+        radius_km = _to_float('radius_km', radius)
+        if not 0 < radius_km <= MAX_RADIUS_KM:
+            raise CriteriaError(f'radius_km must be between 0 and {MAX_RADIUS_KM}')
+
+    box = None
+    if bbox not in (None, ''):
+        parts = bbox.split(',') if isinstance(bbox, str) else bbox
+        if not isinstance(parts, (list, tuple)) or len(parts) != 4:
+            raise CriteriaError('bbox must be south,west,north,east')
+        box = tuple(_to_float('bbox', part) for part in parts)
+        south, west, north, east = box
+        if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+            raise CriteriaError('bbox must be south,west,north,east with south <= north and west <= east')
+
+    return GeoQuery(center, radius_km, box)
+
+
+def _radius_bbox(center, radius_km):
+    """Bounding box around a circle, or None if it reaches a pole or the antimeridian"""
+    lat, lon = center
+    dlat = radius_km / KM_PER_DEGREE
+    if abs(lat) + dlat >= 90:
+        return None
+    dlon = radius_km / (KM_PER_DEGREE * math.cos(math.radians(abs(lat) + dlat)))
+    if lon - dlon < -180 or lon + dlon > 180:
+        return None
+    return (lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+
+
+def _intersect(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+
+
+class GeoIndex:
+    """Grid index of property positions for radius and bounding-box queries.
+
+    Positions are bucketed in square cells of GEO_CELL_DEGREES. A query
+    only visits the cells overlapping its bounding box (the box around the
+    radius circle, if any), checks the candidates' exact positions against
+    the box and computes their haversine distances in one vectorized pass.
+    Properties without coordinates never match a geo query. Kept in sync
+    through the PropertyCatalog listener hooks.
+    """
+
+    def __init__(self, cell_degrees=GEO_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._lock = threading.Lock()
+        self._cells = {}   # (row, col) -> set of property ids
+        self._points = {}  # property_id -> (lat, lon)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def _add(self, property_data):
+        point = coordinates(property_data)
+        if point is None:
+            return
+        self._points[property_data['id']] = point
+        self._cells.setdefault(self._cell(*point), set()).add(property_data['id'])
+
+    def _remove(self, property_id):
+        point = self._points.pop(property_id, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        ids = self._cells[cell]
+        ids.discard(property_id)
+        if not ids:
+            del self._cells[cell]
+
+    # Catalog listener hooks
+
+    def reset(self, properties):
+        with self._lock:
+            self._cells = {}
+            self._points = {}
+            for p in properties:
+                self._add(p)
+
+    def upsert(self, property_data):
+        with self._lock:
+            self._remove(property_data['id'])
+            self._add(property_data)
+
+    def remove(self, property_id):
+        with self._lock:
+            self._remove(property_id)
+
+    # Queries
+
+    def _candidates(self, box):
+        """(ids, lats, lons) of the points in the cells overlapping box (None: all points)"""
+        if box is not None:
+            south, west, north, east = box
+            if south > north or west > east:
+                return [], [], []
+            row_lo, col_lo = self._cell(south, west)
+            row_hi, col_hi = self._cell(north, east)
+            cell_count = (row_hi - row_lo + 1) * (col_hi - col_lo + 1)
+        if box is None or cell_count > len(self._cells):
+            # Scanning every occupied cell is cheaper than probing the empty ones
+            items = self._points.items()
+        else:
+            items = []
+            for row in range(row_lo, row_hi + 1):
+                for col in range(col_lo, col_hi + 1):
+                    for property_id in self._cells.get((row, col), ()):
+                        items.append((property_id, self._points[property_id]))
+        ids = [property_id for property_id, _ in items]
+        lats = [point[0] for _, point in items]
+        lons = [point[1] for _, point in items]
+        return ids, lats, lons
+
+    def search(self, geo):
+        """Properties matching a GeoQuery as {property_id: distance in km}.
+
+        Distances are rounded to DISTANCE_DECIMALS and are None when the
+        query has no center point.
+        """
+        box = geo.bbox
+        if geo.radius_km is not None:
+            box = _intersect(box, _radius_bbox(geo.center, geo.radius_km))
+        with self._lock:
+            ids, lats, lons = self._candidates(box)
+        if not ids:
+            return {}
+
+        if np is None:
+            return self._search_python(geo, box, ids, lats, lons)
+
+        lats = np.array(lats, dtype=np.float64)
+        lons = np.array(lons, dtype=np.float64)
+        keep = np.ones(len(ids), dtype=bool)
+        if box is not None:
+            keep &= (lats >= box[0]) & (lats <= box[2]) & (lons >= box[1]) & (lons <= box[3])
+        if geo.center is None:
+            return {ids[i]: None for i in np.flatnonzero(keep)}
+        distances = np.round(haversine_km(geo.center[0], geo.center[1], lats, lons), DISTANCE_DECIMALS)
+        if geo.radius_km is not None:
+            keep &= distances <= geo.radius_km
+        positions = np.flatnonzero(keep)
+        return dict(zip([ids[i] for i in positions], distances[positions].tolist()))
+
+    def _search_python(self, geo, box, ids, lats, lons):
+        results = {}
+        for property_id, lat, lon in zip(ids, lats, lons):
+            if box is not None and not (box[0] <= lat <= box[2] and box[1] <= lon <= box[3]):
+                continue
+            distance = None
+            if geo.center is not None:
+                distance = round(_haversine_one(geo.center[0], geo.center[1], lat, lon), DISTANCE_DECIMALS)
+                if geo.radius_km is not None and distance > geo.radius_km:
+                    continue
+            results[property_id] = distance
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {'points': len(self._points), 'cells': len(self._cells)}
+
+
+def with_distance(property_data, distances):
+    """Shallow copy of property_data with its distance_km, if the query had a center"""
+    if distances is None:
+        return property_data
+    distance = distances.get(property_data['id'])
+    if distance is None:
+        return property_data
+    return dict(property_data, distance_km=distance)
+
+
+def page_by_distance(properties, distances, limit, after=None):
+    """Keyset page of properties nearest first: returns (page, total, has_more).
+
+    properties are the matches of the other filters; ties are broken by
+    id, and after is the decoded cursor (distance, id) of the previous page.
+    """
+    results = sorted(properties, key=lambda p: (distances[p['id']], p['id']))
+    total = len(results)
+    if after is not None:
+        value, last_id = after
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(last_id, str):
+            raise CursorError('Invalid cursor')
+        results = [p for p in results if (distances[p['id']], p['id']) > (value, last_id)]
+    return results[:limit], total, len(results) > limit
@@ -0,0 +1,57 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import request
+
+
+def make_etag(*parts):
+    """Strong ETag value (without quotes) derived from the given parts"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+def normalized_args(args=None):
+    """Query arguments as a sorted tuple, so parameter order does not matter"""
+    args = request.args if args is None else args
+    return tuple(sorted(args.items(multi=True)))
+
+
+def parse_timestamp(value):
+    """Parse an isoformat timestamp as stored on properties into an aware UTC datetime"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    # Stored timestamps are naive local time (datetime.now().isoformat())
+    return parsed.astimezone(timezone.utc)
+
+
+def latest_timestamp(properties, field='updated_at'):
+    """Most recent timestamp among properties, or None"""
+    latest = None
+    for p in properties:
+        ts = parse_timestamp(p.get(field))
+        if ts is not None and (latest is None or ts > latest):
+            latest = ts
+    return latest
+
+
+def not_modified(etag):
+    """True if the request's If-None-Match matches etag.
+
+    Uses weak comparison as If-None-Match requires, so the W/ form handed
+    out with compressed responses matches too.
+    """
+    return request.if_none_match.contains_weak(etag)
+
+
+def with_validators(response, etag, last_modified=None):
+    """Attach ETag and Last-Modified headers to a response"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
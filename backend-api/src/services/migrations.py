@@ -0,0 +1,300 @@
+import os
+import re
+from collections import namedtuple
+from services.db_pool import DB_CONNECT_TIMEOUT_SECONDS
+
+try:
+    import psycopg2
+    import psycopg2.errors
+except ImportError:  # pragma: no cover - psycopg2-binary is pinned in requirements.txt
+    psycopg2 = None
+
+# pg_advisory_lock key held while migrations run, so workers starting
+# together do not apply the same migration twice
+MIGRATION_LOCK_ID = 74210024
+
+# A numbered schema change. Transactional migrations run all statements
+# and the schema_version insert in one transaction; concurrent ones run
+# each statement on its own (CREATE INDEX CONCURRENTLY cannot run inside
+# a transaction) and must therefore be idempotent.
+Migration = namedtuple('Migration', ('version', 'name', 'statements', 'concurrent'))
+
+BASELINE_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS contacts (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        phone VARCHAR(50),
+        inquiry_type VARCHAR(100),
+        property_type VARCHAR(100),
+        budget_range VARCHAR(100),
+        preferred_contact VARCHAR(50),
+        message TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status VARCHAR(50) DEFAULT 'new'
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS properties (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        description TEXT,
+        price DECIMAL(12,2),
+        location VARCHAR(255),
+        bedrooms INTEGER,
+        bathrooms INTEGER,
+        area DECIMAL(10,2),
+        property_type VARCHAR(100),
+        status VARCHAR(50) DEFAULT 'available',
+        images TEXT[], -- Array of image URLs
+        features TEXT[], -- Array of features
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(80) UNIQUE NOT NULL,
+        email VARCHAR(120) UNIQUE NOT NULL,
+        password_hash VARCHAR(256) NOT NULL,
+        first_name VARCHAR(50),
+        last_name VARCHAR(50),
+        phone VARCHAR(20),
+        profile_image VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP,
+        is_active BOOLEAN DEFAULT TRUE,
+        is_verified BOOLEAN DEFAULT FALSE,
+        verification_token VARCHAR(100),
+        reset_token VARCHAR(100),
+        reset_token_expiry TIMESTAMP,
+        notification_preferences JSONB DEFAULT '{"email_alerts": true, "property_updates": true, "saved_search_alerts": true, "marketing": false}'
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS saved_properties (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        property_id INTEGER REFERENCES properties(id) ON DELETE CASCADE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        notes TEXT,
+        UNIQUE(user_id, property_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS saved_searches (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        name VARCHAR(100) NOT NULL,
+        search_criteria JSONB NOT NULL,
+        alert_frequency VARCHAR(20) DEFAULT 'daily',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_alert_sent TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS property_views (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+        property_id INTEGER REFERENCES properties(id) ON DELETE CASCADE,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        source VARCHAR(50),
+        session_id VARCHAR(100)
+    )
+    ''',
+)
+
+# Indexes for the hot lookups in routes/user.py
+HOT_QUERY_INDEXES = (
+    # Saved properties and saved searches of a user, newest first
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_saved_properties_user_created '
+    'ON saved_properties (user_id, created_at DESC)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_saved_searches_user_created '
+    'ON saved_searches (user_id, created_at DESC)',
+    # View statistics join on property_id
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_property_views_property '
+    'ON property_views (property_id)',
+    # Email verification and password reset look users up by token
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_verification_token '
+    'ON users (verification_token) WHERE verification_token IS NOT NULL',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_reset_token '
+    'ON users (reset_token) WHERE reset_token IS NOT NULL',
+)
+
+# Columns and version counter of the property catalog's postgres backend
+# (services/sql_storage.py): the JSON document and the keys its filters
+# and keyset sorts compare, next to the legacy columns
+CATALOG_COLUMNS = (
+    '''
+    ALTER TABLE properties
+        ADD COLUMN IF NOT EXISTS slug TEXT COLLATE "C" UNIQUE,
+        ADD COLUMN IF NOT EXISTS position BIGINT,
+        ADD COLUMN IF NOT EXISTS data JSONB,
+        ADD COLUMN IF NOT EXISTS version INTEGER,
+        ADD COLUMN IF NOT EXISTS price_key BIGINT,
+        ADD COLUMN IF NOT EXISTS area_key DOUBLE PRECISION,
+        ADD COLUMN IF NOT EXISTS bedrooms_key DOUBLE PRECISION,
+        ADD COLUMN IF NOT EXISTS bathrooms_key DOUBLE PRECISION,
+        ADD COLUMN IF NOT EXISTS energy_label VARCHAR(10),
+        ADD COLUMN IF NOT EXISTS location_lc TEXT,
+        ADD COLUMN IF NOT EXISTS created_key TEXT COLLATE "C"
+    ''',
+    'CREATE TABLE IF NOT EXISTS property_catalog_meta (id INTEGER PRIMARY KEY, version BIGINT NOT NULL)',
+    'INSERT INTO property_catalog_meta (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING',
+)
+
+# Indexes backing the catalog's filters and keyset sorts
+CATALOG_INDEXES = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_properties_price_key ON properties (price_key, slug)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_properties_area_key ON properties (area_key, slug)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_properties_created_key ON properties (created_key, slug)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_properties_status_price ON properties (status, price_key)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_properties_bedrooms_key ON properties (bedrooms_key)',
+)
+
+# Append new migrations with the next version number; never edit or
+# renumber one that has been released
+MIGRATIONS = (
+    Migration(1, 'baseline tables', BASELINE_TABLES, False),
+    Migration(2, 'indexes for hot user queries', HOT_QUERY_INDEXES, True),
+    Migration(3, 'property catalog columns', CATALOG_COLUMNS, False),
+    Migration(4, 'property catalog indexes', CATALOG_INDEXES, True),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+_CONCURRENT_INDEX = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE)
+
+
+def current_version(conn):
+    """Highest applied migration, 0 if schema_version does not exist yet. One query."""
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT max(version) AS version FROM schema_version')
+        row = cur.fetchone()
+        # Pooled connections return RealDictCursor rows
+        version = row['version'] if isinstance(row, dict) else row[0]
+        return version or 0
+    except psycopg2.errors.UndefinedTable:
+        return 0
+    finally:
+        cur.close()
+        conn.rollback()
+
+
+def _drop_invalid_index(cur, statement):
+    """Drop an index left INVALID by an interrupted CREATE INDEX CONCURRENTLY.
+
+    IF NOT EXISTS would otherwise skip it and leave an unusable index.
+    """
+    match = _CONCURRENT_INDEX.search(statement)
+    if not match:
+        return
+    cur.execute("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND NOT i.indisvalid
+    """, (match.group(1),))
+    if cur.fetchone():
+        cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}')
+
+
+def _apply(conn, migration):
+    if migration.concurrent:
+        conn.autocommit = True
+        cur = conn.cursor()
+        try:
+            for statement in migration.statements:
+                _drop_invalid_index(cur, statement)
+                cur.execute(statement)
+            cur.execute('INSERT INTO schema_version (version, name) VALUES (%s, %s)',
+                        (migration.version, migration.name))
+        finally:
+            cur.close()
+        return
+    conn.autocommit = False
+    try:
+        cur = conn.cursor()
+        for statement in migration.statements:
+            cur.execute(statement)
+        cur.execute('INSERT INTO schema_version (version, name) VALUES (%s, %s)',
+                    (migration.version, migration.name))
+        cur.close()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def apply_migrations(conn, migrations=MIGRATIONS):
+    """Apply the migrations newer than the database's schema_version, in order.
+
+    Returns the list of versions applied. When the schema is current this
+    is a single SELECT and no DDL runs. Otherwise the migration lock is
+    taken, the version re-read (another worker may have migrated
+    meanwhile) and each pending migration applied and recorded.
+    """
+    latest = migrations[-1].version if migrations else 0
+    if current_version(conn) >= latest:
+        return []
+
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute('SELECT pg_advisory_lock(%s)', (MIGRATION_LOCK_ID,))
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        version = current_version(conn)
+        applied = []
+        for migration in migrations:
+            if migration.version <= version:
+                continue
+            print(f"Applying database migration {migration.version}: {migration.name}")
+            _apply(conn, migration)
+            applied.append(migration.version)
+        return applied
+    finally:
+        conn.autocommit = True
+        cur.execute('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_ID,))
+        cur.close()
+
+
+def migrate(dsn=None):
+    """Bring the database at dsn (default NEON_DATABASE_URL) up to LATEST_VERSION.
+
+    Uses its own connection rather than the request pool, so index builds
+    are not cut off by the pool's statement timeout. Errors are logged,
+    not raised, so the API still starts when the database is unreachable.
+    """
+    if psycopg2 is None:
+        print("psycopg2 is required to run database migrations")
+        return
+    try:
+        conn = psycopg2.connect(dsn or os.getenv('NEON_DATABASE_URL'),
+                                connect_timeout=DB_CONNECT_TIMEOUT_SECONDS)
+    except Exception as e:
+        print(f"Could not connect to database for migrations: {e}")
+        return
+    try:
+        applied = apply_migrations(conn)
+        if applied:
+            print(f"Database schema migrated to version {applied[-1]}")
+    except Exception as e:
+        print(f"Database migration error: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    # python -m services.migrations, from backend-api/src
+    from dotenv import load_dotenv
+    load_dotenv()
+    migrate()
@@ -0,0 +1,270 @@
+import hashlib
+import itertools
+import threading
+from services.property_fields import normalize_property
+
+
+class CatalogWriteError(Exception):
+    """Raised when a change could not be persisted; the catalog is left unchanged"""
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalog at one point in time.
+
+    properties is in storage order and by_id indexes it. Neither is ever
+    mutated after the snapshot is published; writers build a new snapshot
+    and swap it in.
+
+    version increases with every snapshot this process publishes and is
+    meant for in-process cache keys. token identifies the stored state on
+    disk, so every worker serving the same data derives the same value;
+    it is what HTTP validators (ETags) are built from.
+    """
+
+    __slots__ = ('properties', 'by_id', 'signature', 'version', 'token')
+
+    _versions = itertools.count(1)
+
+    def __init__(self, by_id, signature, properties=None):
+        self.by_id = by_id
+        self.properties = properties if properties is not None else list(by_id.values())
+        self.signature = signature
+        self.version = next(self._versions)
+        self.token = hashlib.sha1(repr(signature).encode()).hexdigest()[:16]
+
+
+class PropertyCatalog:
+    """Process-wide in-memory copy of the stored properties.
+
+    The storage backend (see property_storage) is read once and served
+    from memory afterwards. It is only re-read when its files change on
+    disk (e.g. edited by hand or written by another worker). Writes that go
+    through the catalog update the in-memory copy directly and do not
+    trigger a reload.
+
+    Readers get the current CatalogSnapshot without taking any lock, so a
+    read never waits for a write. Writers are serialized by an in-process
+    lock plus the storage's cross-process lock (see storage.lock());
+    under both they refresh from storage, apply their change to a copy,
+    persist it and then publish the copy as the new snapshot
+    (copy-on-write). Lookups by id stay constant-time through by_id.
+
+    Derived fields (see property_fields.normalize_property) are computed
+    when properties are loaded or written, never on the read path. Each
+    property also carries a version, 1 when created and bumped by every
+    update.
+
+    Secondary indexes register with subscribe() and are told about every
+    change: reset(properties) after a (re)load, upsert(property) after an
+    add or update and remove(property_id) after a delete.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._write_lock = threading.Lock()
+        self._file_lock = storage.lock()
+        self._snapshot = None
+        self._listeners = []
+        if hasattr(storage, 'on_compacted'):
+            storage.on_compacted = self._storage_compacted
+        self.hits = 0
+        self.reloads = 0
+        self.writes = 0
+
+    def _load(self):
+        """Read storage into a new snapshot. Caller must hold the write lock."""
+        signature = self.storage.signature()
+        try:
+            properties = self.storage.load()
+        except Exception as e:
+            print(f"Error loading properties: {str(e)}")
+            properties = []
+        self._snapshot = CatalogSnapshot({p['id']: normalize_property(p) for p in properties}, signature)
+        for listener in self._listeners:
+            listener.reset(self._snapshot.properties)
+        self.reloads += 1
+
+    def _refresh(self):
+        """Reload if storage changed since the current snapshot. Caller must hold the write lock."""
+        snapshot = self._snapshot
+        if snapshot is None or self.storage.signature() != snapshot.signature:
+            self._load()
+
+    def snapshot(self):
+        """Return the current snapshot, reloading first if storage changed on disk"""
+        snapshot = self._snapshot
+        if snapshot is not None and self.storage.signature() == snapshot.signature:
+            self.hits += 1
+            return snapshot
+        with self._write_lock:
+            self._refresh()
+            return self._snapshot
+
+    def subscribe(self, listener):
+        """Register a secondary index to be kept in sync with the catalog"""
+        with self._write_lock:
+            self._listeners.append(listener)
+            if self._snapshot is not None:
+                listener.reset(self._snapshot.properties)
+
+    def _write(self, change):
+        """Apply change(by_id) to a copy of the current state and persist it.
+
+        change mutates the dict copy it is given and returns a tuple
+        (result, storage_write, notify): storage_write(properties) records
+        the change (None means nothing changed) and notify(listener) tells
+        a secondary index about it. Returns result.
+        """
+        with self._write_lock, self._file_lock:
+            self._refresh()
+            by_id = dict(self._snapshot.by_id)
+            result, storage_write, notify = change(by_id)
+            if storage_write is None:
+                return result
+            properties = list(by_id.values())
+            try:
+                storage_write(properties)
+            except Exception as e:
+                print(f"Error saving properties: {str(e)}")
+                # Re-read on the next access; storage may hold part of the change
+                self._snapshot = None
+                raise CatalogWriteError(str(e)) from e
+            self.storage.maybe_compact(properties)
+            self._snapshot = CatalogSnapshot(by_id, self.storage.signature(), properties)
+            for listener in self._listeners:
+                notify(listener)
+            self.writes += 1
+            return result
+
+    def _storage_compacted(self, before, after):
+        """Accept a compaction as our own change instead of reloading for it.
+
+        Signatures are (snapshot, compacting journal, journal). Compaction
+        only touches the first two; the journal part may have moved on
+        through appends made in the meantime.
+        """
+        with self._write_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.signature[:2] == before[:2]:
+                # Same list object, so indexes built for it stay valid
+                self._snapshot = CatalogSnapshot(snapshot.by_id, after[:2] + snapshot.signature[2:],
+                                                 snapshot.properties)
+
+    @property
+    def version(self):
+        """Version of the current snapshot; changes after every write or reload"""
+        return self.snapshot().version
+
+    def all(self):
+        """Return the current list of properties. Callers must not mutate it."""
+        return self.snapshot().properties
+
+    def get(self, property_id):
+        """Return a single property by id, or None"""
+        return self.snapshot().by_id.get(property_id)
+
+    def add(self, property_data):
+        """Add a new property and persist. Returns False if the id is already taken."""
+        def change(by_id):
+            if property_data['id'] in by_id:
+                return False, None, None
+            property_data['version'] = 1
+            by_id[property_data['id']] = normalize_property(property_data)
+            return (True,
+                    lambda properties: self.storage.record_upsert(property_data, properties),
+                    lambda listener: listener.upsert(property_data))
+
+        return self._write(change)
+
+    def update(self, property_id, apply):
+        """Atomically replace a property with apply(existing) and persist.
+
+        apply receives the current property dict (which it must not mutate)
+        and returns the new one. Returns the stored result, or None if no
+        property has this id.
+        """
+        def change(by_id):
+            existing = by_id.get(property_id)
+            if existing is None:
+                return None, None, None
+            updated = normalize_property(apply(existing))
+            updated['version'] = existing.get('version', 0) + 1
+            by_id[property_id] = updated
+            return (updated,
+                    lambda properties: self.storage.record_upsert(updated, properties),
+                    lambda listener: listener.upsert(updated))
+
+        return self._write(change)
+
+    def upsert_many(self, items, apply):
+        """Insert or replace several properties with a single persisted write.
+
+        apply(existing, item) returns the property to store for item, where
+        existing is the current property with the same id or None; it must
+        not mutate existing. Items are applied in order, so a later item
+        with the same id sees the earlier one. Returns one
+        (property, created) pair per item.
+        """
+        def change(by_id):
+            results = []
+            changed = {}
+            for item in items:
+                existing = by_id.get(item['id'])
+                stored = normalize_property(apply(existing, item))
+                stored['version'] = existing.get('version', 0) + 1 if existing is not None else 1
+                by_id[stored['id']] = stored
+                changed[stored['id']] = stored
+                results.append((stored, existing is None))
+            if not changed:
+                return results, None, None
+            changed = list(changed.values())
+
+            def notify(listener):
+                for p in changed:
+                    listener.upsert(p)
+
+            return (results,
+                    lambda properties: self.storage.record_upserts(changed, properties),
+                    notify)
+
+        return self._write(change)
+
+    def remove(self, property_id):
+        """Remove a property by id and persist. Returns False if it did not exist."""
+        def change(by_id):
+            if by_id.pop(property_id, None) is None:
+                return False, None, None
+            return (True,
+                    lambda properties: self.storage.record_delete(property_id, properties),
+                    lambda listener: listener.remove(property_id))
+
+        return self._write(change)
+
+    def save(self, properties):
+        """Persist the full list of properties and make it the in-memory copy"""
+        def change(by_id):
+            by_id.clear()
+            by_id.update((p['id'], normalize_property(p)) for p in properties)
+            return (True,
+                    self.storage.save_all,
+                    lambda listener: listener.reset(self._snapshot.properties))
+
+        return self._write(change)
+
+    def invalidate(self):
+        """Drop the in-memory copy so the next read re-reads storage"""
+        with self._write_lock:
+            self._snapshot = None
+
+    def stats(self):
+        """Return hit/reload/write counters"""
+        snapshot = self._snapshot
+        return {
+            'hits': self.hits,
+            'reloads': self.reloads,
+            'writes': self.writes,
+            'loaded': snapshot is not None,
+            'count': len(snapshot.by_id) if snapshot is not None else 0,
+            'version': snapshot.version if snapshot is not None else None,
+            'storage': self.storage.stats()
+        }
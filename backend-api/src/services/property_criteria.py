@@ -0,0 +1,201 @@
+from collections import namedtuple
+from services.property_fields import price_value
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is pinned in requirements.txt
+    np = None
+
+
+class CriteriaError(ValueError):
+    """Raised for filter criteria with an unknown operator or a value of the wrong type"""
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+# Filterable fields: how to read them from a property dict and which
+# SQL column (see sql_storage.INDEX_COLUMNS) holds the same value. The
+# NumPy column is the ColumnarIndex attribute of the same name.
+Field = namedtuple('Field', ('value', 'sql_column'))
+
+FIELDS = {
+    'location': Field(lambda p: str(p.get('location', '')).lower(), 'location_lc'),
+    'price': Field(price_value, 'price_key'),
+    'bedrooms': Field(lambda p: _number(p.get('bedrooms')), 'bedrooms_key'),
+    'bathrooms': Field(lambda p: _number(p.get('bathrooms')), 'bathrooms_key'),
+    'energy_label': Field(lambda p: p.get('energyLabel'), 'energy_label'),
+    'status': Field(lambda p: p.get('status'), 'status'),
+}
+
+Condition = namedtuple('Condition', ('field', 'op', 'value'))
+
+
+def _to_int(key, value):
+    if isinstance(value, bool):
+        raise CriteriaError(f'{key} must be a number')
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise CriteriaError(f'{key} must be a number')
+
+
+def _to_text(key, value):
+    if not isinstance(value, str):
+        raise CriteriaError(f'{key} must be a string')
+    return value.lower()
+
+
+def _to_label(key, value):
+    if not isinstance(value, str):
+        raise CriteriaError(f'{key} must be a string')
+    return value
+
+
+# Filter keys as they appear in query strings, search request bodies and
+# saved searches: key -> (field, operator, value parser)
+FILTER_KEYS = {
+    'location': ('location', 'contains', _to_text),
+    'min_price': ('price', 'gte', _to_int),
+    'max_price': ('price', 'lte', _to_int),
+    'bedrooms': ('bedrooms', 'gte', _to_int),
+    'bathrooms': ('bathrooms', 'gte', _to_int),
+    'energy_label': ('energy_label', 'eq', _to_label),
+    'status': ('status', 'eq', _to_text),
+}
+
+OPERATORS = ('contains', 'gte', 'lte', 'eq')
+
+SQL_OPERATORS = {'gte': '>=', 'lte': '<=', 'eq': '='}
+
+
+class Criteria:
+    """A validated conjunction of conditions on property fields.
+
+    This is the one representation of listing filters. It compiles to a
+    Python predicate (predicate()), a NumPy mask over a ColumnarIndex
+    (mask()) and a parameterized SQL WHERE fragment (sql()), which all
+    select the same properties. A property whose value is missing or not
+    a number never satisfies a numeric condition.
+    """
+
+    __slots__ = ('conditions',)
+
+    def __init__(self, conditions=()):
+        conditions = tuple(Condition(*c) for c in conditions)
+        for condition in conditions:
+            if condition.field not in FIELDS:
+                raise CriteriaError(f'Unknown filter field: {condition.field}')
+            if condition.op not in OPERATORS:
+                raise CriteriaError(f'Unknown filter operator: {condition.op}')
+        self.conditions = conditions
+
+    def __bool__(self):
+        return bool(self.conditions)
+
+    def __iter__(self):
+        return iter(self.conditions)
+
+    def __eq__(self, other):
+        return isinstance(other, Criteria) and self.conditions == other.conditions
+
+    def __hash__(self):
+        return hash(self.conditions)
+
+    def __repr__(self):
+        return f'Criteria({list(self.conditions)!r})'
+
+    def predicate(self):
+        """Compile to a function property -> bool"""
+        checks = []
+        for field, op, value in self.conditions:
+            get = FIELDS[field].value
+            if op == 'contains':
+                checks.append(lambda p, get=get, value=value: value in get(p))
+            elif op == 'gte':
+                checks.append(lambda p, get=get, value=value: _at_least(get(p), value))
+            elif op == 'lte':
+                checks.append(lambda p, get=get, value=value: _at_most(get(p), value))
+            else:
+                checks.append(lambda p, get=get, value=value: get(p) == value)
+        return lambda p: all(check(p) for check in checks)
+
+    def mask(self, index, rows=None):
+        """Compile to a boolean mask over a ColumnarIndex.
+
+        With rows (an array of positions) only those rows are evaluated and
+        the mask is aligned with rows instead of the whole index.
+        """
+        def column(values):
+            return values if rows is None else values[rows]
+
+        mask = np.ones(index.size if rows is None else len(rows), dtype=bool)
+        for field, op, value in self.conditions:
+            if op == 'eq':
+                # Categorical columns are stored as codes
+                code = getattr(index, field + '_codes').get(value)
+                if code is None:
+                    mask[:] = False
+                else:
+                    mask &= column(getattr(index, field)) == code
+                continue
+            values = column(getattr(index, field))
+            if op == 'contains':
+                mask &= np.char.find(values, value) >= 0
+            elif op == 'gte':
+                mask &= values >= value
+            else:
+                mask &= values <= value
+        return mask
+
+    def sql(self, contains_sql='instr({column}, %s) > 0'):
+        """Compile to (list of WHERE clauses to AND together, list of parameters).
+
+        contains_sql is the dialect's substring test with {column} and one
+        %s placeholder.
+        """
+        clauses = []
+        params = []
+        for field, op, value in self.conditions:
+            column = FIELDS[field].sql_column
+            if op == 'contains':
+                clauses.append(contains_sql.format(column=column))
+            else:
+                clauses.append(f'{column} {SQL_OPERATORS[op]} %s')
+            params.append(value)
+        return clauses, params
+
+
+def _at_least(actual, value):
+    return actual is not None and actual >= value
+
+
+def _at_most(actual, value):
+    return actual is not None and actual <= value
+
+
+def parse_criteria(filters):
+    """Build Criteria from a filters mapping (query args, search filters or saved search criteria).
+
+    Only the keys in FILTER_KEYS are filters; other keys are ignored, as
+    are filters whose value is empty, 0 or None. Raises CriteriaError for
+    values of the wrong type.
+    """
+    if filters is None:
+        return Criteria()
+    if not hasattr(filters, 'get'):
+        raise CriteriaError('Filters must be an object')
+    conditions = []
+    for key, (field, op, parse) in FILTER_KEYS.items():
+        value = filters.get(key)
+        if value is None or value == '':
+            continue
+        value = parse(key, value)
+        if value:
+            conditions.append((field, op, value))
+    return Criteria(conditions)
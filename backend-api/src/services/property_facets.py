@@ -0,0 +1,122 @@
+from services.property_fields import price_value
+from services.property_index import USE_COLUMNAR_INDEX, filter_properties_python, get_columnar_index
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is pinned in requirements.txt
+    np = None
+
+# Upper bounds (exclusive) of the price bands, in euros; the last band is open
+PRICE_BAND_EDGES = (250000, 400000, 600000, 800000, 1000000)
+
+# Bedroom counts from this value up share one bucket
+MAX_BEDROOM_BUCKET = 5
+
+
+def _price_bands():
+    bands = []
+    lower = 0
+    for upper in PRICE_BAND_EDGES:
+        bands.append({'value': f'{lower}-{upper}', 'min': lower, 'max': upper - 1})
+        lower = upper
+    bands.append({'value': f'{lower}+', 'min': lower, 'max': None})
+    return bands
+
+
+PRICE_BANDS = _price_bands()
+
+BEDROOM_BUCKETS = [str(n) for n in range(1, MAX_BEDROOM_BUCKET)] + [f'{MAX_BEDROOM_BUCKET}+']
+
+
+def price_band(property_data):
+    """Index into PRICE_BANDS for a property, or None for a price on request"""
+    price = price_value(property_data)
+    if price <= 0:
+        return None
+    for i, upper in enumerate(PRICE_BAND_EDGES):
+        if price < upper:
+            return i
+    return len(PRICE_BAND_EDGES)
+
+
+def bedroom_bucket(property_data):
+    """Index into BEDROOM_BUCKETS for a property, or None if the count is unknown"""
+    bedrooms = property_data.get('bedrooms')
+    if isinstance(bedrooms, bool) or not isinstance(bedrooms, (int, float)) or bedrooms < 1:
+        return None
+    return min(int(bedrooms), MAX_BEDROOM_BUCKET) - 1
+
+
+def _label(value):
+    return value if isinstance(value, str) and value else None
+
+
+# facet name -> function returning the property's category (a value, or
+# an index into the bucket list for bucketed facets)
+CATEGORIES = {
+    'neighborhood': lambda p: _label(p.get('neighborhood')),
+    'energyLabel': lambda p: _label(p.get('energyLabel')),
+    'status': lambda p: _label(p.get('status')),
+    'bedrooms': bedroom_bucket,
+    'price': price_band,
+}
+
+BUCKETS = {
+    'bedrooms': [{'value': v} for v in BEDROOM_BUCKETS],
+    'price': PRICE_BANDS,
+}
+
+
+def _category_codes(index, name):
+    """(codes array, values list) for a facet, computed once per ColumnarIndex"""
+    key = ('facet', name)
+    cached = index.derived.get(key)
+    if cached is None:
+        category = CATEGORIES[name]
+        vocabulary = {}
+        codes = np.fromiter((vocabulary.setdefault(category(p), len(vocabulary)) for p in index.properties),
+                            dtype=np.int32, count=index.size)
+        cached = index.derived[key] = (codes, list(vocabulary))
+    return cached
+
+
+def _format(name, counts):
+    """Turn {category: count} into the response list for one facet"""
+    buckets = BUCKETS.get(name)
+    if buckets is not None:
+        # Fixed bucket order, including empty buckets, so the sidebar stays stable
+        return [dict(bucket, count=counts.get(i, 0)) for i, bucket in enumerate(buckets)]
+    values = [(value, count) for value, count in counts.items() if value is not None and count]
+    values.sort(key=lambda item: (-item[1], str(item[0])))
+    return [{'value': value, 'count': count} for value, count in values]
+
+
+def compute_facets(properties, criteria, candidates=None):
+    """Count the properties matching criteria per facet category.
+
+    Returns (facets, total) where facets maps each name in CATEGORIES to
+    a list of {'value', 'count'} entries (bucketed facets also carry
+    their bounds). With the columnar index each facet is a single
+    bincount over precomputed category codes of the matching rows.
+    candidates optionally restricts the count to a set of property ids,
+    e.g. the matches of a geo filter.
+    """
+    if USE_COLUMNAR_INDEX and np is not None:
+        index = get_columnar_index(properties)
+        mask = criteria.mask(index)
+        if candidates is not None:
+            mask &= index.candidate_mask(candidates)
+        facets = {}
+        for name in CATEGORIES:
+            codes, values = _category_codes(index, name)
+            counts = np.bincount(codes[mask], minlength=len(values))
+            facets[name] = _format(name, dict(zip(values, counts.tolist())))
+        return facets, int(mask.sum())
+
+    matches = filter_properties_python(properties, criteria, candidates=candidates)
+    counts = {name: {} for name in CATEGORIES}
+    for p in matches:
+        for name, category in CATEGORIES.items():
+            value = category(p)
+            counts[name][value] = counts[name].get(value, 0) + 1
+    return {name: _format(name, counts[name]) for name in CATEGORIES}, len(matches)
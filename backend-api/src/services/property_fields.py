@@ -0,0 +1,98 @@
+import re
+from enum import Enum
+
+
+class PriceCondition(str, Enum):
+    """Dutch price conditions as shown on listings"""
+    KOSTEN_KOPER = 'k.k.'
+    VRIJ_OP_NAAM = 'v.o.n.'
+
+
+_PRICE_NUMBER = re.compile(r'\d[\d.]*(?:,\d+)?')
+_CONDITIONS = [
+    (re.compile(r'\bk\.?\s?k\.?(?!\w)', re.IGNORECASE), PriceCondition.KOSTEN_KOPER),
+    (re.compile(r'\bv\.?\s?o\.?\s?n\.?(?!\w)', re.IGNORECASE), PriceCondition.VRIJ_OP_NAAM),
+]
+
+
+def parse_price(price):
+    """Parse a listing price like '€465.000 k.k.' into (euros, condition).
+
+    Dots are thousands separators and a comma starts the cents part, as in
+    Dutch notation. Returns (None, None) if no amount can be found.
+    """
+    if isinstance(price, bool) or price is None:
+        return None, None
+    if isinstance(price, (int, float)):
+        return int(price), None
+
+    text = str(price)
+    condition = None
+    for pattern, value in _CONDITIONS:
+        if pattern.search(text):
+            condition = value
+            text = pattern.sub('', text)
+            break
+
+    match = _PRICE_NUMBER.search(text)
+    if not match:
+        return None, condition
+    euros = match.group(0).split(',')[0].replace('.', '')
+    return int(euros), condition
+
+
+def normalize_property(property_data):
+    """Fill in derived fields computed from the raw listing data. Mutates and returns the dict."""
+    price_eur, condition = parse_price(property_data.get('price'))
+    property_data['price_eur'] = price_eur
+    property_data['price_condition'] = condition.value if condition else None
+    return property_data
+
+
+def price_value(property_data):
+    """Numeric price used for filtering and sorting; unparseable prices count as 0"""
+    return property_data.get('price_eur') or 0
+
+
+# Named field sets for the fields= parameter. 'card' is what the overview
+# grid renders, 'detail' what the property page renders.
+PROJECTIONS = {
+    'card': ('id', 'title', 'price', 'mainImage', 'area', 'bedrooms', 'status'),
+    'detail': (
+        'id', 'title', 'location', 'neighborhood', 'price', 'price_eur', 'price_condition',
+        'originalPrice', 'size', 'area', 'bedrooms', 'bathrooms', 'energyLabel', 'features',
+        'mainImage', 'images', 'rating', 'status', 'description', 'yearBuilt', 'plotSize',
+        'heating', 'parking', 'garden', 'latitude', 'longitude', 'created_at', 'updated_at',
+        'version',
+    ),
+}
+
+
+def parse_fields(value):
+    """Turn a fields= value into a canonical tuple of field names, or None for all fields.
+
+    value is a comma-separated string or a list of them; each entry is a
+    field name or the name of a projection in PROJECTIONS. The id is always
+    included.
+    """
+    if isinstance(value, str):
+        value = [value]
+    names = [n.strip() for item in value or () for n in str(item).split(',')]
+    names = [n for n in names if n]
+    if not names:
+        return None
+    fields = {'id'}
+    for name in names:
+        fields.update(PROJECTIONS.get(name, (name,)))
+    return tuple(sorted(fields))
+
+
+def project(property_data, fields):
+    """Shallow copy of property_data restricted to fields (None keeps everything).
+
+    Values are shared with the catalog's dict, not copied; the result must
+    be treated as read-only like any catalog data.
+    """
+    if fields is None:
+        return property_data
+    return {f: property_data[f] for f in fields if f in property_data}
@@ -0,0 +1,331 @@
+import base64
+import json
+import math
+import os
+import threading
+from services.property_fields import price_value
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is pinned in requirements.txt
+    np = None
+
+# Set PROPERTIES_COLUMNAR_INDEX=0 to force the pure-Python filter path
+USE_COLUMNAR_INDEX = os.getenv('PROPERTIES_COLUMNAR_INDEX', '1') != '0'
+
+
+def _area_key(missing):
+    """Sort key on area; properties without a numeric area get missing"""
+    def key(property_data):
+        area = property_data.get('area')
+        return area if isinstance(area, (int, float)) and not isinstance(area, bool) else missing
+    return key
+
+
+# sort_by value -> (property key function, descending). Missing areas sort
+# last in both directions, as in the columnar index.
+SORT_OPTIONS = {
+    'price_asc': (price_value, False),
+    'price_desc': (price_value, True),
+    'area_asc': (_area_key(float('inf')), False),
+    'area_desc': (_area_key(float('-inf')), True),
+    'newest': (lambda p: p.get('created_at', ''), True),
+}
+
+
+def filter_properties_python(properties, criteria, sort_by=None, candidates=None):
+    """Reference implementation: filter and sort with plain list operations.
+
+    criteria is a property_criteria.Criteria. candidates is an optional set
+    of property ids to restrict the results to, e.g. the matches of a
+    full-text query.
+    """
+    results = list(properties)
+
+    if candidates is not None:
+        results = [p for p in results if p['id'] in candidates]
+
+    if criteria:
+        matches = criteria.predicate()
+        results = [p for p in results if matches(p)]
+
+    if sort_by in SORT_OPTIONS:
+        key, descending = SORT_OPTIONS[sort_by]
+        results.sort(key=key, reverse=descending)
+
+    return results
+
+
+class CursorError(ValueError):
+    """Raised for a pagination cursor that is malformed or belongs to another sort order"""
+
+
+def encode_cursor(sort_by, property_data):
+    """Opaque cursor pointing just after property_data in sort_by order"""
+    payload = {'s': sort_by, 'k': cursor_value(sort_by, property_data), 'id': property_data['id']}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_by):
+    """Return (sort value, id) from a cursor made by encode_cursor for the same sort_by"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, property_id = payload['k'], payload['id']
+    except Exception:
+        raise CursorError('Invalid cursor')
+    if payload.get('s') != sort_by:
+        raise CursorError('Cursor does not match sort_by')
+    if not isinstance(property_id, str) or not _valid_cursor_value(sort_by, value):
+        raise CursorError('Invalid cursor')
+    return value, property_id
+
+
+def _is_number(value):
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and math.isfinite(value))
+
+
+def _valid_cursor_value(sort_by, value):
+    """Whether value has the type cursor_value produces for sort_by"""
+    if sort_by in ('price_asc', 'price_desc', 'distance'):
+        return _is_number(value)
+    if sort_by in ('area_asc', 'area_desc'):
+        return value is None or _is_number(value)
+    if sort_by == 'newest':
+        return isinstance(value, str)
+    return True
+
+
+def cursor_value(sort_by, property_data):
+    """The sort key a cursor stores for a property (None for unsorted/missing values)"""
+    if sort_by in ('price_asc', 'price_desc'):
+        return price_value(property_data)
+    if sort_by in ('area_asc', 'area_desc'):
+        area = property_data.get('area')
+        return area if isinstance(area, (int, float)) and not isinstance(area, bool) else None
+    if sort_by == 'newest':
+        return property_data.get('created_at', '')
+    if sort_by == 'distance':
+        # Set on the page's copies by geo_index.with_distance
+        return property_data.get('distance_km')
+    return None
+
+
+def _page_key(sort_by, property_data):
+    """Ascending sort key for keyset pages; descending sorts are handled by the caller"""
+    value = cursor_value(sort_by, property_data)
+    if sort_by in ('area_asc', 'area_desc') and value is None:
+        # Missing areas sort last in both directions
+        return float('inf') if sort_by == 'area_asc' else float('-inf')
+    return value
+
+
+def page_properties_python(properties, criteria, sort_by, limit, after=None, candidates=None):
+    """Reference keyset pagination: returns (page, total, has_more).
+
+    Pages are ordered by the sort key with ties broken by id, so a page
+    boundary is fully described by (sort value, id). after is the decoded
+    cursor of the previous page; candidates restricts the rows as in
+    filter_properties_python.
+    """
+    results = filter_properties_python(properties, criteria, candidates=candidates)
+    total = len(results)
+    descending = sort_by in SORT_OPTIONS and SORT_OPTIONS[sort_by][1]
+    results.sort(key=lambda p: p['id'])
+    if sort_by in SORT_OPTIONS:
+        results.sort(key=lambda p: _page_key(sort_by, p), reverse=descending)
+
+    if after is not None:
+        value, last_id = after
+        if sort_by in ('area_asc', 'area_desc') and value is None:
+            value = float('inf') if sort_by == 'area_asc' else float('-inf')
+
+        def is_after(p):
+            if sort_by not in SORT_OPTIONS:
+                return p['id'] > last_id
+            key = _page_key(sort_by, p)
+            if key == value:
+                return p['id'] > last_id
+            return key < value if descending else key > value
+
+        results = [p for p in results if is_after(p)]
+
+    return results[:limit], total, len(results) > limit
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return np.nan
+    return float(value)
+
+
+def _codes(values):
+    """Encode strings as small ints. Returns (codes array, value -> code dict)."""
+    vocabulary = {}
+    codes = np.fromiter((vocabulary.setdefault(v, len(vocabulary)) for v in values),
+                        dtype=np.int32, count=len(values))
+    return codes, vocabulary
+
+
+class ColumnarIndex:
+    """Column-oriented copy of the filterable/sortable property fields.
+
+    Each filter becomes a vectorized comparison and all of them are ANDed
+    into a single boolean mask; ordering uses a stable argsort (or an
+    argpartition when only the top rows are needed) so ties keep file
+    order, matching list.sort semantics.
+    """
+
+    def __init__(self, properties):
+        self.properties = properties
+        n = len(properties)
+        self.size = n
+        self.positions = {p['id']: i for i, p in enumerate(properties)}
+        self.price = np.fromiter((price_value(p) for p in properties), dtype=np.int64, count=n)
+        self.area = np.fromiter((_number(p.get('area')) for p in properties), dtype=np.float64, count=n)
+        self.bedrooms = np.fromiter((_number(p.get('bedrooms')) for p in properties), dtype=np.float64, count=n)
+        self.bathrooms = np.fromiter((_number(p.get('bathrooms')) for p in properties), dtype=np.float64, count=n)
+        self.year_built = np.fromiter((_number(p.get('yearBuilt')) for p in properties), dtype=np.float64, count=n)
+        self.status, self.status_codes = _codes([p.get('status') for p in properties])
+        self.energy_label, self.energy_label_codes = _codes([p.get('energyLabel') for p in properties])
+        self.location = np.array([str(p.get('location', '')).lower() for p in properties], dtype=str)
+        # Rank of created_at so 'newest' can sort on an integer column
+        created = np.array([str(p.get('created_at', '')) for p in properties], dtype=str)
+        self.created_values, self.created_rank = np.unique(created, return_inverse=True)
+        # Ids in sorted order, used as the tie-breaker for keyset pages
+        ids = np.array([str(p['id']) for p in properties], dtype=str)
+        self.id_values, id_rank = np.unique(ids, return_inverse=True)
+        self.id_order = np.argsort(id_rank, kind='stable')
+        self.id_rank = id_rank
+        # Further columns other modules derive from the same properties
+        # (e.g. facet codes), built on first use
+        self.derived = {}
+
+    def mask(self, criteria, rows=None):
+        """Boolean mask of the rows matching criteria (see Criteria.mask)"""
+        return criteria.mask(self, rows)
+
+    def _sort_key(self, sort_by):
+        if sort_by == 'price_asc':
+            return self.price
+        if sort_by == 'price_desc':
+            return -self.price
+        # Missing areas sort last in both directions
+        if sort_by == 'area_asc':
+            return np.nan_to_num(self.area, nan=np.inf)
+        if sort_by == 'area_desc':
+            return -np.nan_to_num(self.area, nan=-np.inf)
+        if sort_by == 'newest':
+            return -self.created_rank
+        return None
+
+    def order(self, positions, sort_by=None, limit=None):
+        """Order the given row positions (ascending) by sort_by, keeping at most limit rows"""
+        key = self._sort_key(sort_by)
+        if key is None:
+            return positions if limit is None else positions[:limit]
+
+        keys = key[positions]
+        if limit is not None and limit < len(positions):
+            if limit <= 0:
+                return positions[:0]
+            # Select the top rows without sorting everything. Rows tied with
+            # the cut-off value are taken in file order, as a stable sort would.
+            cutoff = keys[np.argpartition(keys, limit - 1)[:limit]].max()
+            below = keys < cutoff
+            ties = np.flatnonzero(keys == cutoff)[:limit - int(below.sum())]
+            keep = np.sort(np.concatenate([np.flatnonzero(below), ties]))
+            positions, keys = positions[keep], keys[keep]
+
+        return positions[np.argsort(keys, kind='stable')]
+
+    def _after_cursor(self, sort_by, value, last_id):
+        """Mask of rows strictly after (value, last_id) in keyset page order"""
+        id_after = self.id_rank >= np.searchsorted(self.id_values, last_id, side='right')
+        if sort_by in ('price_asc', 'price_desc'):
+            column, value = self.price, value
+        elif sort_by in ('area_asc', 'area_desc'):
+            missing = np.inf if sort_by == 'area_asc' else -np.inf
+            column = np.nan_to_num(self.area, nan=missing)
+            value = missing if value is None else value
+        elif sort_by == 'newest':
+            # Compare strings through their position among the sorted created_at values
+            lo = np.searchsorted(self.created_values, value, side='left')
+            hi = np.searchsorted(self.created_values, value, side='right')
+            equal = self.created_rank == lo if lo < hi else np.zeros(self.size, dtype=bool)
+            return (self.created_rank < lo) | (equal & id_after)
+        else:
+            return id_after
+
+        beyond = column < value if SORT_OPTIONS[sort_by][1] else column > value
+        return beyond | ((column == value) & id_after)
+
+    def candidate_mask(self, candidates):
+        """Boolean mask of the rows whose id is in candidates"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[[self.positions[i] for i in candidates if i in self.positions]] = True
+        return mask
+
+    def page(self, criteria, sort_by, limit, after=None, candidates=None):
+        """Keyset pagination: returns (page, total, has_more), see page_properties_python"""
+        mask = self.mask(criteria)
+        if candidates is not None:
+            mask &= self.candidate_mask(candidates)
+        total = int(mask.sum())
+        if after is not None:
+            mask &= self._after_cursor(sort_by, *after)
+        # Visiting rows in id order makes the stable sort break ties by id
+        positions = self.id_order[mask[self.id_order]]
+        page = self.order(positions, sort_by, limit + 1)
+        return [self.properties[i] for i in page[:limit]], total, len(page) > limit
+
+    def select(self, criteria, sort_by=None, candidates=None, limit=None):
+        """Return the matching properties in sorted order"""
+        if candidates is None:
+            positions = np.flatnonzero(self.mask(criteria))
+        else:
+            rows = np.array(sorted(self.positions[i] for i in candidates if i in self.positions),
+                            dtype=np.intp)
+            positions = rows[self.mask(criteria, rows)]
+        positions = self.order(positions, sort_by, limit)
+        return [self.properties[i] for i in positions]
+
+
+_index_lock = threading.Lock()
+_cached_index = None
+
+
+def get_columnar_index(properties):
+    """Return a ColumnarIndex for this exact list object, rebuilding it when the list changes"""
+    global _cached_index
+    with _index_lock:
+        if _cached_index is None or _cached_index.properties is not properties:
+            _cached_index = ColumnarIndex(properties)
+        return _cached_index
+
+
+def page_properties(properties, criteria, sort_by, limit, after=None, candidates=None):
+    """Return one keyset page of filtered properties as (page, total, has_more)"""
+    if USE_COLUMNAR_INDEX and np is not None:
+        return get_columnar_index(properties).page(criteria, sort_by, limit, after, candidates)
+    return page_properties_python(properties, criteria, sort_by, limit, after, candidates)
+
+
+def filter_properties(properties, criteria, sort_by=None, candidates=None):
+    """Filter and sort properties, using the columnar index when available"""
+    if USE_COLUMNAR_INDEX and np is not None:
+        return get_columnar_index(properties).select(criteria, sort_by, candidates)
+    return filter_properties_python(properties, criteria, sort_by, candidates)
+
+
+def filter_many(properties, criteria_list, sort_by=None):
+    """Evaluate several criteria against the same properties, e.g. all saved searches.
+
+    The columnar index is built (or reused) once and each criteria then
+    costs one vectorized mask. Returns one result list per criteria.
+    """
+    if USE_COLUMNAR_INDEX and np is not None:
+        index = get_columnar_index(properties)
+        return [index.select(criteria, sort_by) for criteria in criteria_list]
+    return [filter_properties_python(properties, criteria, sort_by) for criteria in criteria_list]
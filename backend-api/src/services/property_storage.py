@@ -0,0 +1,290 @@
+import json
+import os
+import threading
+from services.file_lock import FileLock
+
+# 'json' rewrites the whole file on every write, 'journal' appends change records,
+# 'sqlite' and 'postgres' keep one row per property (see sql_storage)
+PROPERTIES_STORAGE = os.getenv('PROPERTIES_STORAGE', 'json')
+
+# Journal size after which it is folded into a new snapshot
+JOURNAL_COMPACT_BYTES = int(os.getenv('PROPERTIES_JOURNAL_COMPACT_BYTES', str(1024 * 1024)))
+
+# fsync every journal append; turn off only where losing the last writes on a crash is acceptable
+JOURNAL_FSYNC = os.getenv('PROPERTIES_JOURNAL_FSYNC', '1') != '0'
+
+
+def _stat_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    # The inode changes with every atomic rename, even within one mtime tick
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _write_temp(path, data):
+    """Write data as JSON next to path and return the temp file name"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def write_json_atomic(path, data):
+    """Write data as JSON to a temp file and rename it over path"""
+    os.replace(_write_temp(path, data), path)
+
+
+def _read_snapshot(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class JsonFileStorage:
+    """Stores the catalog as a single JSON array, rewritten on every change"""
+
+    name = 'json'
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.version = 0
+
+    def lock(self):
+        """Context manager serializing writers across worker processes"""
+        return FileLock(self.lock_path)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def signature(self):
+        """Changes whenever the stored data changes on disk"""
+        return _stat_signature(self.path)
+
+    def load(self):
+        return _read_snapshot(self.path)
+
+    def save_all(self, properties):
+        write_json_atomic(self.path, properties)
+        self.version += 1
+
+    def record_upsert(self, property_data, properties):
+        self.save_all(properties)
+
+    def record_delete(self, property_id, properties):
+        self.save_all(properties)
+
+    def record_upserts(self, properties_data, properties):
+        self.save_all(properties)
+
+    def maybe_compact(self, properties):
+        pass
+
+    def stats(self):
+        return {'backend': self.name, 'version': self.version}
+
+
+class JournalStorage:
+    """Snapshot plus append-only JSONL journal of changes.
+
+    Each write appends one record to <path>.journal:
+        {"op": "upsert", "version": 7, "property": {...}}
+        {"op": "delete", "version": 8, "id": "..."}
+    and loading replays the journal on top of the snapshot (<path>, the
+    same JSON array JsonFileStorage uses). Once the journal grows past
+    JOURNAL_COMPACT_BYTES it is renamed aside and a background thread
+    writes a fresh snapshot via temp file + atomic rename, then deletes
+    the renamed journal. A crash at any point leaves a snapshot plus
+    journal(s) that replay to the same state, because upserts and deletes
+    are idempotent when applied in order.
+    """
+
+    name = 'journal'
+
+    def __init__(self, path, compact_bytes=JOURNAL_COMPACT_BYTES, fsync=JOURNAL_FSYNC):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.journal_path = path + '.journal'
+        self.compacting_path = path + '.journal.compacting'
+        self.compact_bytes = compact_bytes
+        self.fsync = fsync
+        self.version = 0
+        self.compactions = 0
+        self._io_lock = threading.Lock()
+        self._compaction_thread = None
+        # Called with (signature before, signature after) once a compaction
+        # has replaced the snapshot, so the catalog need not reload for it
+        self.on_compacted = None
+
+    def lock(self):
+        return FileLock(self.lock_path)
+
+    def exists(self):
+        return any(os.path.exists(p) for p in (self.path, self.compacting_path, self.journal_path))
+
+    def signature(self):
+        return (_stat_signature(self.path), _stat_signature(self.compacting_path),
+                _stat_signature(self.journal_path))
+
+    def _replay(self, journal_path, by_id):
+        if not os.path.exists(journal_path):
+            return
+        with open(journal_path, 'r') as f:
+            lines = f.readlines()
+        for number, line in enumerate(lines, 1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash mid-append is expected; skip it
+                if number != len(lines):
+                    print(f"Skipping corrupt journal record {journal_path}:{number}")
+                continue
+            self.version = max(self.version, record.get('version', 0))
+            if record['op'] == 'upsert':
+                by_id[record['property']['id']] = record['property']
+            elif record['op'] == 'delete':
+                by_id.pop(record['id'], None)
+
+    def load(self):
+        with self._io_lock:
+            by_id = {p['id']: p for p in _read_snapshot(self.path)}
+            self._replay(self.compacting_path, by_id)
+            self._replay(self.journal_path, by_id)
+            return list(by_id.values())
+
+    def _append(self, records):
+        """Append records in one write and (optionally) one fsync"""
+        with self._io_lock:
+            lines = []
+            for record in records:
+                self.version += 1
+                record['version'] = self.version
+                lines.append(json.dumps(record) + '\n')
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.journal_path, 'a') as f:
+                f.write(''.join(lines))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    def record_upsert(self, property_data, properties):
+        self._append([{'op': 'upsert', 'property': property_data}])
+
+    def record_delete(self, property_id, properties):
+        self._append([{'op': 'delete', 'id': property_id}])
+
+    def record_upserts(self, properties_data, properties):
+        self._append([{'op': 'upsert', 'property': p} for p in properties_data])
+
+    def save_all(self, properties):
+        """Replace everything with a new snapshot and an empty journal"""
+        with self._io_lock:
+            write_json_atomic(self.path, properties)
+            for path in (self.compacting_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.version += 1
+
+    def maybe_compact(self, properties):
+        """Start a background compaction if the journal is over the size threshold.
+
+        properties must be the catalog state that includes every record in
+        the journal; the caller holds the catalog write lock so no write can
+        slip in between.
+        """
+        with self._io_lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            if os.path.exists(self.compacting_path):
+                return
+            try:
+                size = os.path.getsize(self.journal_path)
+            except OSError:
+                return
+            if size < self.compact_bytes:
+                return
+            os.replace(self.journal_path, self.compacting_path)
+            before = self.signature()
+        self._compaction_thread = threading.Thread(
+            target=self._compact, args=(list(properties), before), daemon=True)
+        self._compaction_thread.start()
+
+    def _compact(self, properties, before):
+        tmp_path = None
+        after = None
+        try:
+            # Serialize outside the locks so writers are not blocked meanwhile
+            tmp_path = _write_temp(self.path, properties)
+            with FileLock(self.lock_path), self._io_lock:
+                # If the rotated journal is gone, a save_all() (possibly in
+                # another process) already wrote a newer snapshot
+                if _stat_signature(self.compacting_path) != before[1]:
+                    return
+                os.replace(tmp_path, self.path)
+                tmp_path = None
+                os.remove(self.compacting_path)
+                self.compactions += 1
+                after = self.signature()
+        except Exception as e:
+            print(f"Error compacting properties journal: {str(e)}")
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # Outside the io lock: the callback takes the catalog lock
+        if after is not None and self.on_compacted is not None:
+            self.on_compacted(before, after)
+
+    def stats(self):
+        try:
+            journal_bytes = os.path.getsize(self.journal_path)
+        except OSError:
+            journal_bytes = 0
+        return {
+            'backend': self.name,
+            'version': self.version,
+            'journal_bytes': journal_bytes,
+            'compactions': self.compactions
+        }
+
+
+def create_storage(path, backend=None):
+    """Build the storage backend selected by PROPERTIES_STORAGE.
+
+    Every backend offers the same interface: lock(), exists(), signature(),
+    load(), save_all(), record_upsert(), record_upserts(), record_delete(),
+    maybe_compact() and stats(). The SQL backends (sql_storage) also
+    offer query() to run filtered, sorted, paginated reads in the
+    database. For 'sqlite' the database file sits next to path unless
+    PROPERTIES_SQLITE_PATH is set; 'postgres' connects to
+    PROPERTIES_DATABASE_URL, falling back to NEON_DATABASE_URL. Both SQL
+    backends import the listings stored at path (JSON snapshot plus
+    journal) the first time they find their table empty.
+    """
+    backend = backend or PROPERTIES_STORAGE
+    if backend == 'journal':
+        return JournalStorage(path)
+    if backend == 'json':
+        return JsonFileStorage(path)
+    if backend == 'sqlite':
+        from services.sql_storage import SqliteStorage
+        return SqliteStorage(os.getenv('PROPERTIES_SQLITE_PATH', os.path.splitext(path)[0] + '.db'), seed_path=path)
+    if backend == 'postgres':
+        from services.sql_storage import PostgresStorage
+        return PostgresStorage(os.getenv('PROPERTIES_DATABASE_URL') or os.getenv('NEON_DATABASE_URL'),
+                               seed_path=path)
+    raise ValueError(f"Unknown properties storage backend: {backend}")
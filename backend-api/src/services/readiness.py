@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from services.db_pool import get_db_connection, DatabaseUnavailable
+
+# How long a readiness result is reused before the database is probed again
+READY_CACHE_SECONDS = float(os.getenv('READY_CACHE_SECONDS', '5'))
+
+
+def database_ready():
+    """Run SELECT 1 on a pooled connection; returns (ok, error message or None)"""
+    try:
+        conn = get_db_connection()
+    except DatabaseUnavailable:
+        return False, 'Database circuit breaker open'
+    if conn is None:
+        return False, 'Database connection failed'
+    try:
+        cur = conn.cursor()
+        try:
+            cur.execute('SELECT 1')
+            cur.fetchone()
+        finally:
+            cur.close()
+        conn.rollback()
+        return True, None
+    except Exception as e:
+        print(f"Readiness probe error: {e}")
+        return False, 'Database query failed'
+    finally:
+        conn.close()
+
+
+class CachedProbe:
+    """Runs check() at most once per ttl seconds and shares the result.
+
+    Only one caller runs the check at a time; callers arriving meanwhile
+    get the previous result (or wait for the first one), so any number of
+    probes costs at most one database round trip per ttl.
+    """
+
+    def __init__(self, check, ttl=READY_CACHE_SECONDS):
+        self.check = check
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked = None  # time.monotonic() of the last check
+        self.checks = 0
+
+    def result(self):
+        """(ok, error, checked_at ISO timestamp, age in seconds)"""
+        result, checked = self._result, self._checked
+        if result is not None and time.monotonic() - checked < self.ttl:
+            return result + (round(time.monotonic() - checked, 3),)
+        # Without a previous result every caller waits for the first check
+        if not self._lock.acquire(blocking=result is None):
+            return result + (round(time.monotonic() - checked, 3),)
+        try:
+            if self._result is None or time.monotonic() - self._checked >= self.ttl:
+                ok, error = self.check()
+                self.checks += 1
+                self._result = (ok, error, datetime.now(timezone.utc).isoformat())
+                self._checked = time.monotonic()
+            return self._result + (round(time.monotonic() - self._checked, 3),)
+        finally:
+            self._lock.release()
+
+
+readiness = CachedProbe(database_ready)
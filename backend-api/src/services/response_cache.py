@@ -0,0 +1,88 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Upper bounds for the serialized responses kept in memory
+RESPONSE_CACHE_ENTRIES = int(os.getenv('PROPERTIES_RESPONSE_CACHE_ENTRIES', '256'))
+RESPONSE_CACHE_BYTES = int(os.getenv('PROPERTIES_RESPONSE_CACHE_BYTES', str(8 * 1024 * 1024)))
+
+
+class ResponseCache:
+    """LRU cache of serialized response bodies.
+
+    Keys are expected to include the catalog snapshot version, so an entry
+    can never be served for data it was not built from. The cache is also
+    registered as a catalog listener and drops everything on any change,
+    which frees the memory held by entries for versions that are gone.
+
+    Bounded both by number of entries and by total body size; the least
+    recently used entries are evicted first. Bodies larger than the whole
+    byte budget are not cached.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_ENTRIES, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Store value, accounting size bytes against the budget"""
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    # Catalog listener hooks: any change makes every cached response stale
+
+    def reset(self, properties):
+        self.clear()
+
+    def upsert(self, property_data):
+        self.clear()
+
+    def remove(self, property_id):
+        self.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,279 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from services.trigram_index import TrigramIndex
+
+# Fields that take part in free-text search, with their BM25 weight
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'location': 2.0,
+    'features': 1.5,
+    'description': 1.0,
+}
+SEARCH_FIELDS = tuple(FIELD_WEIGHTS)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score multiplier for prefix and compound-part matches versus exact tokens
+PARTIAL_MATCH_WEIGHT = 0.7
+
+# Common Dutch compound endings in listing texts. A token ending in one of
+# these is also indexed as its parts, so 'Fruitmarkt' matches 'markt' and
+# 'fruit'.
+COMPOUND_SUFFIXES = (
+    'markt', 'straat', 'laan', 'weg', 'wegje', 'plein', 'kade', 'gracht',
+    'park', 'tuin', 'zicht', 'keuken', 'kamer', 'huis', 'woning', 'centrum',
+    'wijk', 'buurt', 'dijk', 'singel', 'hof', 'haven', 'strand', 'bad',
+    'plaats', 'terras', 'balkon', 'zolder', 'ligging', 'verwarming',
+)
+
+STOP_WORDS = frozenset((
+    'de', 'het', 'een', 'en', 'van', 'in', 'op', 'met', 'te', 'aan', 'voor',
+    'bij', 'naar', 'om', 'of', 'is', 'dit', 'die', 'dat', 'the', 'a', 'an',
+    'and', 'of', 'in', 'with', 'for', 'to',
+))
+
+MIN_PREFIX_LENGTH = 3
+
+# Typo tolerance: a query token that matches nothing is compared by
+# trigram similarity against the words of these fields
+FUZZY_FIELDS = ('title', 'location', 'neighborhood')
+FUZZY_MIN_SIMILARITY = 0.4
+FUZZY_MIN_LENGTH = 4
+FUZZY_MAX_TERMS = 5
+FUZZY_MATCH_WEIGHT = 0.5
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def fold(text):
+    """Lowercase and strip diacritics ('Café' -> 'cafe')"""
+    decomposed = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def split_compound(token):
+    """Return the parts of a Dutch compound word, or [] if it is not one"""
+    for suffix in COMPOUND_SUFFIXES:
+        head = token[:-len(suffix)]
+        if token.endswith(suffix) and len(head) >= 3:
+            parts = [head, suffix]
+            # Linking 's' as in 'stadscentrum' -> 'stad' + 'centrum'
+            if head.endswith('s') and len(head) > 3:
+                parts.append(head[:-1])
+            return parts
+    return []
+
+
+def tokenize(text):
+    """Split text into normalized search tokens, without compound parts"""
+    return [t for t in _TOKEN.findall(fold(text)) if t not in STOP_WORDS]
+
+
+def index_terms(text):
+    """Tokens to index for a piece of text, including compound parts"""
+    terms = []
+    for token in tokenize(text):
+        terms.append(token)
+        terms.extend(split_compound(token))
+    return terms
+
+
+def property_text_fields(property_data):
+    """Yield (field, text) pairs for the searchable fields of a property"""
+    for field in SEARCH_FIELDS:
+        value = property_data.get(field)
+        if not value:
+            continue
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                yield field, item
+        else:
+            yield field, value
+
+
+class SearchIndex:
+    """Inverted index from normalized tokens to property ids, scored with BM25.
+
+    Term frequencies and document lengths are field-weighted (see
+    FIELD_WEIGHTS), so a hit in the title counts more than one in the
+    description. Kept in sync with the PropertyCatalog through its
+    listener hooks (reset/upsert/remove), so a write only re-indexes the
+    affected property. A query costs a lookup per query token plus the
+    size of the matching postings, independent of the catalog size.
+
+    Tokens that match nothing, not even by prefix or as a compound, fall
+    back to the most similar words (by character trigrams) of the
+    FUZZY_FIELDS, so 'schorrerlan' still finds 'Schorerlaan'.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}  # term -> {property_id: weighted term frequency}
+        self._doc_terms = {}  # property_id -> set of terms, for removal
+        self._doc_length = {}  # property_id -> weighted number of terms
+        self._total_length = 0.0
+        self._vocabulary = []  # sorted terms, for prefix matching
+        self._fuzzy = TrigramIndex()
+        self._doc_fuzzy_terms = {}  # property_id -> words added to the trigram index
+
+    def _add(self, property_data, update_vocabulary=True):
+        property_id = property_data['id']
+        counts = {}
+        length = 0.0
+        for field, text in property_text_fields(property_data):
+            weight = FIELD_WEIGHTS[field]
+            for term in index_terms(text):
+                counts[term] = counts.get(term, 0.0) + weight
+                length += weight
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if update_vocabulary:
+                    bisect.insort(self._vocabulary, term)
+            postings[property_id] = tf
+        self._doc_terms[property_id] = set(counts)
+        self._doc_length[property_id] = length
+        self._total_length += length
+        fuzzy_terms = []
+        for field in FUZZY_FIELDS:
+            value = property_data.get(field)
+            if isinstance(value, str):
+                fuzzy_terms.extend(tokenize(value))
+        for term in fuzzy_terms:
+            self._fuzzy.add(term, property_id)
+        self._doc_fuzzy_terms[property_id] = fuzzy_terms
+
+    def _remove(self, property_id):
+        for term in self._doc_fuzzy_terms.pop(property_id, ()):
+            self._fuzzy.remove(term, property_id)
+        self._total_length -= self._doc_length.pop(property_id, 0.0)
+        for term in self._doc_terms.pop(property_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(property_id, None)
+            if not postings:
+                del self._postings[term]
+                i = bisect.bisect_left(self._vocabulary, term)
+                if i < len(self._vocabulary) and self._vocabulary[i] == term:
+                    del self._vocabulary[i]
+
+    # Catalog listener hooks
+
+    def reset(self, properties):
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_length = {}
+            self._total_length = 0.0
+            self._fuzzy = TrigramIndex()
+            self._doc_fuzzy_terms = {}
+            for p in properties:
+                self._add(p, update_vocabulary=False)
+            self._vocabulary = sorted(self._postings)
+
+    def upsert(self, property_data):
+        with self._lock:
+            self._remove(property_data['id'])
+            self._add(property_data)
+
+    def remove(self, property_id):
+        with self._lock:
+            self._remove(property_id)
+
+    # Queries
+
+    def _expand(self, token):
+        """Index terms matching a query token as (term, weight): exact first, then by prefix"""
+        terms = []
+        if token in self._postings:
+            terms.append((token, 1.0))
+        if len(token) >= MIN_PREFIX_LENGTH:
+            i = bisect.bisect_left(self._vocabulary, token)
+            while i < len(self._vocabulary) and self._vocabulary[i].startswith(token):
+                if self._vocabulary[i] != token:
+                    terms.append((self._vocabulary[i], PARTIAL_MATCH_WEIGHT))
+                i += 1
+        return terms
+
+    def _term_scores(self, term, weight, scores):
+        """Add the BM25 contribution of one index term into scores (best match per property)"""
+        postings = self._postings[term]
+        n = len(self._doc_length)
+        idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+        avg_length = self._total_length / n if n else 1.0
+        for property_id, tf in postings.items():
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_length[property_id] / avg_length)
+            score = weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+            if score > scores.get(property_id, 0.0):
+                scores[property_id] = score
+
+    def _token_scores(self, token, fuzzy=True):
+        """Scores of the properties matching a single query token"""
+        scores = {}
+        for term, weight in self._expand(token):
+            self._term_scores(term, weight, scores)
+        if not scores:
+            # 'fruitmarkt' should still find 'Fruit markt'
+            parts = split_compound(token)
+            if parts:
+                head, tail = self._token_scores(parts[0], False), self._token_scores(parts[1], False)
+                for property_id in head.keys() & tail.keys():
+                    scores[property_id] = PARTIAL_MATCH_WEIGHT * (head[property_id] + tail[property_id])
+        if not scores and fuzzy and len(token) >= FUZZY_MIN_LENGTH:
+            self._fuzzy_scores(token, scores)
+        return scores
+
+    def _fuzzy_scores(self, token, scores):
+        """Score properties containing words similar to a token that matched nothing"""
+        for term, similarity in self._fuzzy.similar(token, FUZZY_MIN_SIMILARITY, FUZZY_MAX_TERMS):
+            weight = FUZZY_MATCH_WEIGHT * similarity
+            if term in self._postings:
+                self._term_scores(term, weight, scores)
+                continue
+            # Only in a field BM25 does not cover (neighborhood)
+            for property_id in self._fuzzy.properties(term):
+                if weight > scores.get(property_id, 0.0):
+                    scores[property_id] = weight
+
+    def search(self, query):
+        """Return {property_id: relevance score} for properties matching every token in query.
+
+        Returns None if the query has no searchable tokens (e.g. only stop
+        words), meaning the text query does not restrict the results.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        with self._lock:
+            # Most selective token first keeps the intersections small
+            per_token = sorted((self._token_scores(t) for t in tokens), key=len)
+        result = per_token[0]
+        for scores in per_token[1:]:
+            if not result:
+                break
+            result = {i: s + scores[i] for i, s in result.items() if i in scores}
+        return result
+
+
+def rank(properties, scores, count=None):
+    """Order properties by descending score, keeping input order for ties.
+
+    With count, only the best count properties are returned, selected with
+    a bounded heap instead of sorting every match.
+    """
+    def key(item):
+        return (-scores.get(item[1]['id'], 0.0), item[0])
+
+    if count is None:
+        ranked = sorted(enumerate(properties), key=key)
+    else:
+        ranked = heapq.nsmallest(count, enumerate(properties), key=key)
+    return [p for _, p in ranked]
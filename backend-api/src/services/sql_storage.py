@@ -0,0 +1,554 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from services.circuit_breaker import CircuitBreaker
+from services.db_pool import ConnectionPool, DB_BREAKER_FAILURE_THRESHOLD, DB_BREAKER_RESET_SECONDS
+from services.file_lock import FileLock
+from services.migrations import current_version, migrate
+from services.property_storage import JournalStorage
+from services.property_fields import price_value
+
+try:
+    import psycopg2
+    from psycopg2.extras import Json, execute_batch
+except ImportError:  # pragma: no cover - psycopg2-binary is pinned in requirements.txt
+    psycopg2 = None
+
+# How long a worker trusts its last look at the catalog version before
+# asking the database again (writes made by this worker are seen at once)
+SQL_POLL_SECONDS = float(os.getenv('PROPERTIES_SQL_POLL_SECONDS', '1.0'))
+
+# Columns kept next to the JSON document so filters and sorts can use indexes.
+# They hold exactly the values the in-memory filters compare (see property_index).
+INDEX_COLUMNS = ('price_key', 'area_key', 'bedrooms_key', 'bathrooms_key',
+                 'energy_label', 'status', 'location_lc', 'created_key')
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def _text(value):
+    return value if isinstance(value, str) else None
+
+
+def index_values(property_data):
+    """Values of INDEX_COLUMNS for a property"""
+    return (
+        price_value(property_data),
+        _number(property_data.get('area')),
+        _number(property_data.get('bedrooms')),
+        _number(property_data.get('bathrooms')),
+        _text(property_data.get('energyLabel')),
+        _text(property_data.get('status')),
+        str(property_data.get('location', '')).lower(),
+        str(property_data.get('created_at', '')),
+    )
+
+
+class SqlStorage(ABC):
+    """Catalog storage in a SQL table, one row per property.
+
+    Each row holds the full property as a JSON document plus the columns in
+    INDEX_COLUMNS, so query() can run filters, sorting and keyset
+    pagination in the database with the same semantics as
+    property_index.page_properties_python. Rows keep the catalog order in
+    a position column.
+
+    A one-row property_catalog_meta table holds a counter bumped in the
+    same transaction as every write; it is the signature the catalog uses
+    to notice changes made by other workers. Subclasses provide the
+    connection, DDL and dialect details.
+
+    With seed_path, an empty table is filled once from the JSON snapshot
+    and journal at that path (the 'json'/'journal' backends' files), so
+    switching an existing deployment to a SQL backend keeps its catalog.
+    """
+
+    # Dialect details, set by subclasses
+    placeholder = '%s'
+    contains_sql = None
+    slug_collation = ''
+
+    def __init__(self, poll_seconds=SQL_POLL_SECONDS, seed_path=None):
+        self.poll_seconds = poll_seconds
+        self.seed_path = seed_path
+        self.version = 0
+        self._conn = None
+        self._conn_pid = None
+        self._conn_lock = threading.RLock()
+        self._checked_at = 0.0
+        # Writer lock depth of the current thread; other threads keep reading
+        self._local = threading.local()
+        self.queries = 0
+
+    @property
+    def _holding_lock(self):
+        return getattr(self._local, 'holding_lock', 0)
+
+    # Connection handling
+
+    @abstractmethod
+    def _connect(self):
+        """Open the connection shared by all queries"""
+
+    @abstractmethod
+    def _create_schema(self, cur):
+        """Make sure the tables and indexes exist, on a new connection"""
+
+    def _sql(self, statement):
+        return statement.replace('%s', self.placeholder)
+
+    def _run(self, work):
+        """Run work(cursor) in a transaction on the shared connection and return its result"""
+        with self._conn_lock:
+            if self._conn is not None and self._conn_pid != os.getpid():
+                # Inherited through fork; the parent still owns it, so leave it alone
+                self._conn = None
+            if self._conn is None:
+                self._conn = self._connect()
+                self._conn_pid = os.getpid()
+                cur = self._conn.cursor()
+                try:
+                    self._create_schema(cur)
+                    self._conn.commit()
+                except Exception:
+                    # Check the schema again on the next connection
+                    cur.close()
+                    self._close()
+                    raise
+                cur.close()
+            cur = self._conn.cursor()
+            try:
+                result = work(cur)
+                self._conn.commit()
+                return result
+            except Exception:
+                try:
+                    self._conn.rollback()
+                except Exception:
+                    # Connection is unusable; open a new one next time
+                    self._close()
+                raise
+            finally:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                # A pooled connection must really be closed, not returned
+                # to the pool with its session (and any advisory lock)
+                getattr(conn, 'discard', conn.close)()
+            except Exception:
+                pass
+
+    # Storage interface
+
+    def lock(self):
+        """Context manager serializing writers across workers"""
+        return _FreshReads(self, self._writer_lock())
+
+    @abstractmethod
+    def _writer_lock(self):
+        """Context manager serializing writers across workers"""
+
+    def _has_rows(self):
+        def work(cur):
+            cur.execute(self._sql('SELECT 1 FROM properties WHERE slug IS NOT NULL AND data IS NOT NULL LIMIT 1'))
+            return cur.fetchone() is not None
+        return self._run(work)
+
+    def exists(self):
+        """Whether the table holds listings, after importing seed_path into an empty one"""
+        try:
+            return self._has_rows() or self._import_seed()
+        except Exception as e:
+            # Assume there is data rather than risk seeding over it
+            print(f"Error checking properties storage: {str(e)}")
+            return True
+
+    def _import_seed(self):
+        if not self.seed_path:
+            return False
+        source = JournalStorage(self.seed_path)
+        if not source.exists():
+            return False
+        with self.lock():
+            # Another worker may have imported meanwhile
+            if self._has_rows():
+                return True
+            properties = source.load()
+            if not properties:
+                return False
+            self.save_all(properties)
+        print(f"Imported {len(properties)} properties from {self.seed_path} into the {self.name} catalog")
+        return True
+
+    def signature(self):
+        """The catalog version counter, re-read at most every poll_seconds.
+
+        If the database cannot be reached, or another thread is still
+        waiting on it, the last known version is returned, so readers keep
+        being served from memory meanwhile.
+        """
+        now = time.monotonic()
+        if self._holding_lock or now - self._checked_at >= self.poll_seconds:
+            # Writers must see the current version; readers do not queue up
+            # behind a query already in flight
+            if not self._conn_lock.acquire(blocking=bool(self._holding_lock)):
+                return ('sql', self.version)
+            try:
+                def work(cur):
+                    cur.execute('SELECT version FROM property_catalog_meta WHERE id = 1')
+                    row = cur.fetchone()
+                    return self._value(row, 'version') if row else 0
+                try:
+                    self.version = self._run(work)
+                except Exception as e:
+                    print(f"Error reading properties catalog version: {str(e)}")
+                self._checked_at = now
+            finally:
+                self._conn_lock.release()
+        return ('sql', self.version)
+
+    def load(self):
+        def work(cur):
+            cur.execute(self._sql(
+                'SELECT data FROM properties WHERE slug IS NOT NULL AND data IS NOT NULL '
+                'ORDER BY position, id'))
+            return [self._document(self._value(row, 'data')) for row in cur.fetchall()]
+        return self._run(work)
+
+    def save_all(self, properties):
+        """Make the table hold exactly properties, in this order"""
+        def work(cur):
+            keep = {p['id'] for p in properties}
+            cur.execute(self._sql('SELECT slug FROM properties WHERE slug IS NOT NULL'))
+            stale = [self._value(row, 'slug') for row in cur.fetchall()]
+            stale = [(slug,) for slug in stale if slug not in keep]
+            if stale:
+                self._executemany(cur, self._sql('DELETE FROM properties WHERE slug = %s'), stale)
+            self._upsert(cur, properties, 0, update_position=True)
+            return self._bump(cur)
+        self._finish_write(self._run(work))
+
+    def record_upsert(self, property_data, properties):
+        self.record_upserts([property_data], properties)
+
+    def record_upserts(self, properties_data, properties):
+        def work(cur):
+            cur.execute('SELECT COALESCE(MAX(position), -1) + 1 AS next_position FROM properties')
+            self._upsert(cur, properties_data, self._value(cur.fetchone(), 'next_position'),
+                         update_position=False)
+            return self._bump(cur)
+        self._finish_write(self._run(work))
+
+    def record_delete(self, property_id, properties):
+        def work(cur):
+            cur.execute(self._sql('DELETE FROM properties WHERE slug = %s'), (property_id,))
+            return self._bump(cur)
+        self._finish_write(self._run(work))
+
+    def maybe_compact(self, properties):
+        pass
+
+    def stats(self):
+        return {'backend': self.name, 'version': self.version, 'queries': self.queries}
+
+    # Writes
+
+    def _columns(self, property_data):
+        """(column names, values) stored for a property, besides slug and position"""
+        return (('data', 'version') + INDEX_COLUMNS,
+                (self._json(property_data), property_data.get('version', 0)) + index_values(property_data))
+
+    def _upsert(self, cur, properties, first_position, update_position):
+        if not properties:
+            return
+        names = self._columns(properties[0])[0]
+        updated = list(names) + (['position'] if update_position else [])
+        statement = self._sql(
+            f"INSERT INTO properties (slug, position, {', '.join(names)}) "
+            f"VALUES ({', '.join(['%s'] * (len(names) + 2))}) "
+            f"ON CONFLICT (slug) DO UPDATE SET {', '.join(f'{n} = excluded.{n}' for n in updated)}")
+        rows = [(p['id'], first_position + i) + tuple(self._columns(p)[1]) for i, p in enumerate(properties)]
+        self._executemany(cur, statement, rows)
+
+    def _executemany(self, cur, statement, rows):
+        cur.executemany(statement, rows)
+
+    def _bump(self, cur):
+        cur.execute('UPDATE property_catalog_meta SET version = version + 1 WHERE id = 1')
+        cur.execute('SELECT version FROM property_catalog_meta WHERE id = 1')
+        return self._value(cur.fetchone(), 'version')
+
+    def _finish_write(self, version):
+        # The catalog holds the writer lock, so no other worker wrote since
+        # its refresh and the new counter describes exactly its state
+        self.version = version
+        self._checked_at = time.monotonic()
+
+    # Pushed-down queries
+
+    supports_query = True
+
+    def _where(self, criteria):
+        clauses, params = criteria.sql(self.contains_sql)
+        return ['slug IS NOT NULL', 'data IS NOT NULL'] + clauses, params
+
+    def _keyset(self, sort_by, after):
+        """ORDER BY clause and the condition selecting rows after the cursor"""
+        slug = f'slug{self.slug_collation}'
+        if sort_by in ('price_asc', 'price_desc', 'newest'):
+            column = 'price_key' if sort_by != 'newest' else f'created_key{self.slug_collation}'
+            op, direction = ('<', 'DESC') if sort_by != 'price_asc' else ('>', 'ASC')
+            order = f'{column} {direction}, {slug}'
+            if after is None:
+                return order, None, []
+            value, last_id = after
+            return (order, f'({column} {op} %s OR ({column} = %s AND {slug} > %s))',
+                    [value, value, last_id])
+        if sort_by in ('area_asc', 'area_desc'):
+            # Missing areas sort last in both directions
+            op, direction = ('>', 'ASC') if sort_by == 'area_asc' else ('<', 'DESC')
+            order = f'area_key IS NULL, area_key {direction}, {slug}'
+            if after is None:
+                return order, None, []
+            value, last_id = after
+            if value is None:
+                return order, f'(area_key IS NULL AND {slug} > %s)', [last_id]
+            return (order, f'(area_key {op} %s OR area_key IS NULL OR (area_key = %s AND {slug} > %s))',
+                    [value, value, last_id])
+        if after is None:
+            return slug, None, []
+        return slug, f'{slug} > %s', [after[1]]
+
+    def query(self, criteria, sort_by, limit, after=None):
+        """Keyset page of properties matching criteria (a Criteria) as (page, total, has_more), computed in the database"""
+        clauses, params = self._where(criteria)
+        order, cursor_clause, cursor_params = self._keyset(sort_by, after)
+
+        def work(cur):
+            where = ' AND '.join(clauses)
+            cur.execute(self._sql(f'SELECT COUNT(*) AS total FROM properties WHERE {where}'), params)
+            total = self._value(cur.fetchone(), 'total')
+            if cursor_clause:
+                where = f'{where} AND {cursor_clause}'
+            cur.execute(self._sql(f'SELECT data FROM properties WHERE {where} ORDER BY {order} LIMIT %s'),
+                        params + cursor_params + [limit + 1])
+            rows = [self._document(self._value(row, 'data')) for row in cur.fetchall()]
+            return rows, total
+
+        rows, total = self._run(work)
+        self.queries += 1
+        return rows[:limit], total, len(rows) > limit
+
+    # Row helpers
+
+    def _value(self, row, key):
+        return row[key] if isinstance(row, dict) else row[0]
+
+    def _json(self, property_data):
+        return json.dumps(property_data)
+
+    def _document(self, value):
+        return json.loads(value) if isinstance(value, str) else value
+
+
+class _FreshReads:
+    """Holds a writer lock and bypasses the signature poll interval meanwhile"""
+
+    def __init__(self, storage, lock):
+        self.storage = storage
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.__enter__()
+        local = self.storage._local
+        local.holding_lock = getattr(local, 'holding_lock', 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.storage._local.holding_lock -= 1
+        return self.lock.__exit__(exc_type, exc_value, traceback)
+
+
+class SqliteStorage(SqlStorage):
+    """SqlStorage in a local SQLite file; writers across processes share a file lock"""
+
+    name = 'sqlite'
+    placeholder = '?'
+    contains_sql = 'instr({column}, %s) > 0'
+
+    def __init__(self, path, poll_seconds=SQL_POLL_SECONDS, seed_path=None):
+        super().__init__(poll_seconds, seed_path)
+        self.path = path
+        self.lock_path = path + '.lock'
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _create_schema(self, cur):
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS properties (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                slug TEXT UNIQUE,
+                position INTEGER,
+                data TEXT,
+                version INTEGER,
+                price_key INTEGER,
+                area_key REAL,
+                bedrooms_key REAL,
+                bathrooms_key REAL,
+                energy_label TEXT,
+                status TEXT,
+                location_lc TEXT,
+                created_key TEXT
+            )
+        ''')
+        for statement in _INDEXES:
+            cur.execute(statement)
+        cur.execute('CREATE TABLE IF NOT EXISTS property_catalog_meta (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)')
+        cur.execute('INSERT OR IGNORE INTO property_catalog_meta (id, version) VALUES (1, 0)')
+
+    def _writer_lock(self):
+        return FileLock(self.lock_path)
+
+
+# Indexes backing the filters and keyset sorts of query() in SQLite; the
+# postgres ones are created by migrations.CATALOG_INDEXES
+_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_properties_price_key ON properties (price_key, slug)',
+    'CREATE INDEX IF NOT EXISTS idx_properties_area_key ON properties (area_key, slug)',
+    'CREATE INDEX IF NOT EXISTS idx_properties_created_key ON properties (created_key, slug)',
+    'CREATE INDEX IF NOT EXISTS idx_properties_status_price ON properties (status, price_key)',
+    'CREATE INDEX IF NOT EXISTS idx_properties_bedrooms_key ON properties (bedrooms_key)',
+)
+
+# Arbitrary constant identifying the catalog writer lock among advisory locks
+CATALOG_ADVISORY_LOCK = 74210016
+
+# Schema version (services/migrations.py) that adds the catalog columns and indexes
+CATALOG_SCHEMA_VERSION = 4
+
+
+class PostgresStorage(SqlStorage):
+    """SqlStorage on the PostgreSQL properties table created by the baseline migration.
+
+    The catalog columns are added to that table by migrations 3 and 4
+    (run from here if the database is older), so listings written here
+    are the rows saved_properties and property_views reference (slug is
+    the catalog id, the SERIAL id stays the row key). The legacy columns
+    (title, price, images, ...) are filled in as well. Writers in all
+    workers and hosts are serialized with a session advisory lock.
+
+    The connection is checked out of a one-connection db_pool pool and
+    kept while it works (the advisory lock belongs to its session), so it
+    gets the pool's connect and statement timeouts and its own circuit
+    breaker: while that is open, reads keep being served from memory
+    without waiting on the database.
+    """
+
+    name = 'postgres'
+    contains_sql = 'strpos({column}, %s) > 0'
+    # Compare ids and timestamps bytewise, as Python does, whatever the database locale
+    slug_collation = ' COLLATE "C"'
+
+    def __init__(self, dsn, poll_seconds=SQL_POLL_SECONDS, seed_path=None):
+        if psycopg2 is None:
+            raise RuntimeError('psycopg2 is required for the postgres properties storage')
+        super().__init__(poll_seconds, seed_path)
+        self.dsn = dsn
+        self._pool = ConnectionPool(
+            dsn, minconn=0, maxconn=1,
+            breaker=CircuitBreaker('properties', DB_BREAKER_FAILURE_THRESHOLD, DB_BREAKER_RESET_SECONDS))
+
+    def _connect(self):
+        return self._pool.getconn()
+
+    def stats(self):
+        stats = super().stats()
+        stats['pool'] = self._pool.stats()
+        return stats
+
+    def _create_schema(self, cur):
+        # The table, its catalog columns and indexes and property_catalog_meta
+        # come from migrations; a current schema costs one version check
+        if current_version(self._conn) >= CATALOG_SCHEMA_VERSION:
+            return
+        migrate(self.dsn)
+        if current_version(self._conn) < CATALOG_SCHEMA_VERSION:
+            raise RuntimeError(f'properties catalog needs database schema version {CATALOG_SCHEMA_VERSION}')
+
+    def _writer_lock(self):
+        return _AdvisoryLock(self)
+
+    def _columns(self, property_data):
+        names, values = super()._columns(property_data)
+        legacy = (
+            ('title', str(property_data.get('title') or property_data['id'])[:255]),
+            ('description', _text(property_data.get('description'))),
+            ('price', property_data.get('price_eur')),
+            ('location', (_text(property_data.get('location')) or '')[:255] or None),
+            ('bedrooms', _integer(property_data.get('bedrooms'))),
+            ('bathrooms', _integer(property_data.get('bathrooms'))),
+            ('area', _number(property_data.get('area'))),
+            ('images', [str(i) for i in property_data.get('images') or []]),
+            ('features', [str(f) for f in property_data.get('features') or []]),
+            ('created_at', _timestamp(property_data.get('created_at'))),
+            ('updated_at', _timestamp(property_data.get('updated_at'))),
+        )
+        return names + tuple(n for n, _ in legacy), values + tuple(v for _, v in legacy)
+
+    def _json(self, property_data):
+        return Json(property_data)
+
+    def _executemany(self, cur, statement, rows):
+        execute_batch(cur, statement, rows, page_size=500)
+
+
+class _AdvisoryLock:
+    """Session-level PostgreSQL advisory lock on the storage's connection"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def __enter__(self):
+        self.storage._run(lambda cur: cur.execute('SELECT pg_advisory_lock(%s)', (CATALOG_ADVISORY_LOCK,)))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.storage._run(lambda cur: cur.execute('SELECT pg_advisory_unlock(%s)', (CATALOG_ADVISORY_LOCK,)))
+        except Exception as e:
+            # The lock dies with the session; drop the connection to be sure
+            print(f"Error releasing properties advisory lock: {str(e)}")
+            with self.storage._conn_lock:
+                self.storage._close()
+
+
+def _integer(value):
+    value = _number(value)
+    return int(value) if value is not None else None
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,67 @@
+def trigrams(term):
+    """Character trigrams of a term, padded like pg_trgm so word starts weigh more"""
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Maps terms to their character trigrams for typo-tolerant lookups.
+
+    Each term also remembers which properties contain it, so terms are
+    added and dropped incrementally as properties are indexed and
+    removed. Not thread-safe on its own; the owning index serializes
+    access.
+    """
+
+    def __init__(self):
+        self._terms = {}  # term -> {property_id: occurrences}
+        self._term_trigrams = {}  # term -> set of trigrams
+        self._postings = {}  # trigram -> set of terms
+
+    def add(self, term, property_id):
+        docs = self._terms.get(term)
+        if docs is None:
+            docs = self._terms[term] = {}
+            grams = self._term_trigrams[term] = trigrams(term)
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(term)
+        docs[property_id] = docs.get(property_id, 0) + 1
+
+    def remove(self, term, property_id):
+        docs = self._terms.get(term)
+        if docs is None or property_id not in docs:
+            return
+        docs[property_id] -= 1
+        if docs[property_id] > 0:
+            return
+        del docs[property_id]
+        if docs:
+            return
+        del self._terms[term]
+        for gram in self._term_trigrams.pop(term):
+            terms = self._postings[gram]
+            terms.discard(term)
+            if not terms:
+                del self._postings[gram]
+
+    def properties(self, term):
+        """Ids of the properties containing term"""
+        return self._terms.get(term, {}).keys()
+
+    def similar(self, term, threshold, limit=None):
+        """Indexed terms whose trigram similarity (Jaccard) to term is at least threshold.
+
+        Returns [(term, similarity)], most similar first.
+        """
+        grams = trigrams(term)
+        shared = {}
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        matches = []
+        for candidate, count in shared.items():
+            similarity = count / (len(grams) + len(self._term_trigrams[candidate]) - count)
+            if similarity >= threshold:
+                matches.append((candidate, similarity))
+        matches.sort(key=lambda item: (-item[1], item[0]))
+        return matches if limit is None else matches[:limit]
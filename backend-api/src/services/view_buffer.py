@@ -0,0 +1,337 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from services.db_pool import get_db_connection, DatabaseUnavailable
+
+try:
+    import psycopg2
+    from psycopg2.extras import execute_values
+except ImportError:  # pragma: no cover - psycopg2-binary is pinned in requirements.txt
+    psycopg2 = None
+    execute_values = None
+
+# Errors caused by the rows themselves, which no retry will fix
+REFUSED_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError) if psycopg2 is not None else ()
+
+# Set PROPERTY_VIEWS_BUFFERED=0 to insert every view synchronously again
+PROPERTY_VIEWS_BUFFERED = os.getenv('PROPERTY_VIEWS_BUFFERED', '1') != '0'
+
+# Most views held in memory; further views are refused until a flush makes room
+VIEW_BUFFER_MAX = int(os.getenv('VIEW_BUFFER_MAX', '10000'))
+
+# A flush starts once this many views are queued, or after the interval
+VIEW_FLUSH_BATCH = int(os.getenv('VIEW_FLUSH_BATCH', '500'))
+VIEW_FLUSH_INTERVAL_SECONDS = float(os.getenv('VIEW_FLUSH_INTERVAL_SECONDS', '2'))
+
+# How long a request waits for room in a full buffer before it is refused
+VIEW_ENQUEUE_WAIT_SECONDS = float(os.getenv('VIEW_ENQUEUE_WAIT_SECONDS', '0.05'))
+
+# Known property ids are reloaded this often, and at most this often on a miss
+KNOWN_IDS_REFRESH_SECONDS = float(os.getenv('KNOWN_IDS_REFRESH_SECONDS', '60'))
+KNOWN_IDS_MISS_REFRESH_SECONDS = float(os.getenv('KNOWN_IDS_MISS_REFRESH_SECONDS', '5'))
+
+# Column limits of property_views.source and property_views.session_id
+VIEW_SOURCE_MAX_LENGTH = 50
+VIEW_SESSION_ID_MAX_LENGTH = 100
+
+# Longest a shutdown flush may take
+VIEW_SHUTDOWN_FLUSH_SECONDS = float(os.getenv('VIEW_SHUTDOWN_FLUSH_SECONDS', '10'))
+
+INSERT_VIEWS_SQL = '''
+    INSERT INTO property_views (user_id, property_id, timestamp, source, session_id)
+    VALUES %s
+'''
+
+
+def view_field_error(source, session_id):
+    """Error message if source or session_id would not fit property_views, else None"""
+    for name, value, max_length in (('source', source, VIEW_SOURCE_MAX_LENGTH),
+                                    ('session_id', session_id, VIEW_SESSION_ID_MAX_LENGTH)):
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            return f'{name} must be a string'
+        if len(value) > max_length:
+            return f'{name} must be at most {max_length} characters'
+    return None
+
+
+class KnownPropertyIds:
+    """In-memory set of the ids in the properties table, for validating views.
+
+    The set is reloaded every KNOWN_IDS_REFRESH_SECONDS, and an unknown id
+    triggers a reload at most every KNOWN_IDS_MISS_REFRESH_SECONDS, so a
+    newly added property is accepted quickly while requests for ids that
+    do not exist cannot turn into one query each. Only one request reloads
+    at a time; the others answer from the current set meanwhile. When a
+    reload fails the last loaded set keeps being served and the next
+    attempt waits KNOWN_IDS_MISS_REFRESH_SECONDS, so a slow or unavailable
+    database does not hold up view requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None
+        self._loaded_at = None
+        self._attempted_at = None
+
+    def _reload(self):
+        self._attempted_at = time.monotonic()
+        try:
+            conn = get_db_connection()
+        except DatabaseUnavailable:
+            # With ids loaded before the circuit opened, keep serving them
+            if self._ids is None:
+                raise
+            return
+        if conn is None:
+            return
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT id FROM properties')
+            ids = {row['id'] for row in cur.fetchall()}
+            cur.close()
+            conn.rollback()
+        except Exception as e:
+            print(f"Error loading property ids: {e}")
+            return
+        finally:
+            conn.close()
+        self._ids = ids
+        self._loaded_at = time.monotonic()
+
+    def _reload_due(self, property_id, now):
+        ids = self._ids
+        if self._attempted_at is not None and now - self._attempted_at < min(
+                KNOWN_IDS_MISS_REFRESH_SECONDS, KNOWN_IDS_REFRESH_SECONDS):
+            return False
+        if ids is None:
+            return True
+        age = now - self._loaded_at
+        return age >= KNOWN_IDS_REFRESH_SECONDS or (
+            property_id not in ids and age >= KNOWN_IDS_MISS_REFRESH_SECONDS)
+
+    def contains(self, property_id):
+        """True/False, or None if the ids could not be loaded yet"""
+        ids = self._ids
+        if not self._reload_due(property_id, time.monotonic()):
+            return None if ids is None else property_id in ids
+        if not self._lock.acquire(blocking=ids is None):
+            # Another request is reloading
+            return property_id in ids
+        try:
+            # Another request may have reloaded while this one waited
+            if self._reload_due(property_id, time.monotonic()):
+                self._reload()
+            ids = self._ids
+            return None if ids is None else property_id in ids
+        finally:
+            self._lock.release()
+
+
+class ViewBuffer:
+    """Bounded in-process queue of property views, written to the database in batches.
+
+    offer() only appends to the queue; a background thread inserts the
+    queued rows with one multi-row execute_values statement per batch once
+    VIEW_FLUSH_BATCH rows are waiting or VIEW_FLUSH_INTERVAL_SECONDS have
+    passed. When the queue holds VIEW_BUFFER_MAX rows, offer() wakes the
+    flusher, waits briefly for room and otherwise refuses the view, so a
+    slow database cannot grow memory without bound. Rows of a flush that
+    could not reach the database are retried first on the next one, while
+    rows the database refuses (DataError, IntegrityError) are logged and
+    dropped so they cannot block the queue. Remaining rows are flushed at
+    interpreter exit, and the thread is restarted in forked workers.
+    """
+
+    def __init__(self, max_size=VIEW_BUFFER_MAX, batch_size=VIEW_FLUSH_BATCH,
+                 interval=VIEW_FLUSH_INTERVAL_SECONDS):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self._cond = threading.Condition(threading.Lock())
+        self._rows = deque()
+        self._flushing = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._stats = {
+            'queued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed_flushes': 0,
+            'rejected': 0,
+            'invalid': 0,
+            'dropped': 0,
+            'last_flush_seconds': None,
+        }
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The parent's rows are the parent's to write, and its flush thread
+        # does not exist in the child
+        self._cond = threading.Condition(threading.Lock())
+        self._rows = deque()
+        self._flushing = threading.Lock()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='view-buffer-flush', daemon=True)
+                self._thread.start()
+
+    def offer(self, row):
+        """Queue a (user_id, property_id, timestamp, source, session_id) row; False if full"""
+        self._ensure_thread()
+        deadline = time.monotonic() + VIEW_ENQUEUE_WAIT_SECONDS
+        with self._cond:
+            if self._closed:
+                self._stats['rejected'] += 1
+                return False
+            while len(self._rows) >= self.max_size:
+                self._cond.notify_all()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    self._stats['rejected'] += 1
+                    return False
+                self._cond.wait(remaining)
+            self._rows.append(row)
+            self._stats['queued'] += 1
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    def _run(self):
+        failed = False
+        while True:
+            with self._cond:
+                if failed:
+                    # Back off for a full interval after a failed flush,
+                    # even if offer() keeps waking the thread
+                    deadline = time.monotonic() + self.interval
+                    while not self._closed and time.monotonic() < deadline:
+                        self._cond.wait(deadline - time.monotonic())
+                elif len(self._rows) < self.batch_size and not self._closed:
+                    self._cond.wait(self.interval)
+                if self._closed:
+                    return
+            try:
+                failed = not self.flush()
+            except Exception as e:
+                print(f"Error flushing property views: {e}")
+                failed = True
+
+    def flush(self):
+        """Write the queued rows, one batch statement per batch_size rows.
+
+        Returns False if the database could not be reached; the batch is
+        put back at the head of the queue and the remaining rows are left
+        for the next flush. A batch the database refuses is written row by
+        row instead, dropping the rows it refuses.
+        """
+        with self._flushing:
+            while True:
+                with self._cond:
+                    batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+                    # Room was made: wake requests waiting in offer()
+                    self._cond.notify_all()
+                if not batch:
+                    return True
+                if not self._write(batch):
+                    self._requeue(batch)
+                    return False
+
+    def _requeue(self, batch):
+        with self._cond:
+            # Views queued during the flush may have taken the room; the
+            # oldest rows are kept and the rest dropped to stay within max_size
+            room = max(0, self.max_size - len(self._rows))
+            if len(batch) > room:
+                print(f"Dropping {len(batch) - room} property views: buffer full after a failed flush")
+                self._stats['dropped'] += len(batch) - room
+                batch = batch[:room]
+            self._rows.extendleft(reversed(batch))
+
+    def _write(self, batch):
+        """Insert batch; False if it has to be retried because the database could not be reached"""
+        started = time.monotonic()
+        try:
+            conn = get_db_connection()
+        except Exception:
+            conn = None
+        if conn is None:
+            self._record_failure()
+            return False
+        invalid = 0
+        try:
+            cur = conn.cursor()
+            try:
+                execute_values(cur, INSERT_VIEWS_SQL, batch, page_size=len(batch))
+            except REFUSED_ERRORS as e:
+                # A row does not fit the table, e.g. its user or property was
+                # deleted while it was queued: retrying the batch would fail
+                # forever, so write the rows one by one
+                conn.rollback()
+                print(f"Property view batch refused, writing it row by row: {e}")
+                invalid = self._write_rows(cur, batch)
+            cur.close()
+            conn.commit()
+        except Exception as e:
+            print(f"Error writing property views: {e}")
+            self._record_failure()
+            return False
+        finally:
+            # Returning it to the pool rolls back a failed transaction
+            conn.close()
+        with self._cond:
+            self._stats['written'] += len(batch) - invalid
+            self._stats['invalid'] += invalid
+            self._stats['batches'] += 1
+            self._stats['last_flush_seconds'] = round(time.monotonic() - started, 6)
+        return True
+
+    def _write_rows(self, cur, batch):
+        """Insert rows one by one, skipping those the database refuses; returns how many were skipped"""
+        invalid = 0
+        for row in batch:
+            cur.execute('SAVEPOINT property_view')
+            try:
+                execute_values(cur, INSERT_VIEWS_SQL, [row])
+            except REFUSED_ERRORS as e:
+                cur.execute('ROLLBACK TO SAVEPOINT property_view')
+                print(f"Dropping property view of property {row[1]}: {e}")
+                invalid += 1
+        return invalid
+
+    def _record_failure(self):
+        with self._cond:
+            self._stats['failed_flushes'] += 1
+
+    def close(self):
+        """Stop the flush thread and write what is still queued (bounded by VIEW_SHUTDOWN_FLUSH_SECONDS)"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(VIEW_SHUTDOWN_FLUSH_SECONDS)
+        deadline = time.monotonic() + VIEW_SHUTDOWN_FLUSH_SECONDS
+        while self._rows and time.monotonic() < deadline:
+            if not self.flush():
+                time.sleep(0.5)
+        if self._rows:
+            print(f"Dropping {len(self._rows)} unwritten property views at shutdown")
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._rows)
+            stats['max_size'] = self.max_size
+        return stats
@@ -0,0 +1,204 @@
+import json
+import os
+import random
+import shutil
+import sys
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import pytest
+
+# The app imports its modules relative to backend-api/src
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+from services.property_fields import normalize_property
+
+# The catalog shipped with the app, served by the app fixture
+SHIPPED_CATALOG = os.path.join(SRC_DIR, 'data', 'properties.json')
+
+
+class FakeCursor:
+    """Stands in for a psycopg2 cursor; see FakeConnection and FakeDatabase"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.row = None
+
+    def execute(self, sql, params=None):
+        conn, database = self.conn, self.conn.database
+        conn.executed.append(sql)
+        if conn.failures:
+            raise conn.failures.pop(0)
+        if sql in database.errors:
+            raise database.errors[sql]
+        self.row = database.results.get(sql, {'?column?': 1})
+        if sql == 'SAVEPOINT property_view':
+            conn.savepoint = len(conn.pending)
+        elif sql == 'ROLLBACK TO SAVEPOINT property_view':
+            del conn.pending[conn.savepoint:]
+        elif 'schema_version' in sql:
+            self._schema_version(sql, params)
+        elif 'FROM pg_index' in sql:
+            self.row = (1,) if params[0] in database.invalid_indexes else None
+
+    def _schema_version(self, sql, params):
+        database = self.conn.database
+        if sql.lstrip().startswith('CREATE TABLE'):
+            if database.schema_versions is None:
+                database.schema_versions = []
+        elif database.schema_versions is None:
+            raise psycopg2.errors.UndefinedTable('relation "schema_version" does not exist')
+        elif sql.startswith('SELECT max(version)'):
+            self.row = {'version': max(database.schema_versions, default=None)}
+        elif sql.startswith('INSERT INTO schema_version'):
+            if self.conn.autocommit:
+                database.schema_versions.append(params[0])
+            else:
+                self.conn.pending_versions.append(params[0])
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Stands in for a psycopg2 connection.
+
+    failures holds exceptions raised by the next statements, cursor_error
+    one raised by cursor(); rows inserted through pending are added to the
+    database's rows on commit, as are schema versions recorded outside
+    autocommit.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.closed = 0
+        self.autocommit = False
+        self.failures = []
+        self.cursor_error = None
+        self.executed = []
+        self.pending = []
+        self.pending_versions = []
+        self.savepoint = None
+
+    def time_out_next(self):
+        self.failures.append(psycopg2.extensions.QueryCanceledError('canceling statement due to statement timeout'))
+
+    def cursor(self, *args, **kwargs):
+        if self.cursor_error is not None:
+            raise self.cursor_error
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        self.database.rows.extend(self.pending)
+        if self.pending_versions:
+            self.database.schema_versions.extend(self.pending_versions)
+        self.pending = []
+        self.pending_versions = []
+
+    def rollback(self):
+        self.pending = []
+        self.pending_versions = []
+
+    def close(self):
+        self.rollback()
+        self.closed = 1
+
+
+class FakeDatabase:
+    """connect() opens FakeConnections (or fails while down).
+
+    results maps SQL to the row fetchone() returns and errors to the
+    exception executing it raises. schema_versions lists the applied
+    migrations, None until the schema_version table is created, and
+    invalid_indexes names indexes left INVALID by an interrupted build.
+    """
+
+    def __init__(self):
+        self.down = False
+        self.connections = []
+        self.rows = []
+        self.results = {}
+        self.errors = {}
+        self.schema_versions = None
+        self.invalid_indexes = set()
+
+    def connect(self):
+        if self.down:
+            raise psycopg2.OperationalError('could not connect to server')
+        self.connections.append(FakeConnection(self))
+        return self.connections[-1]
+
+
+@pytest.fixture
+def database():
+    return FakeDatabase()
+
+
+def generate_properties(count, seed):
+    """Listings with duplicate sort values, missing and invalid fields and non-ASCII text"""
+    rng = random.Random(seed)
+    properties = []
+    for i in range(count):
+        p = {
+            'id': f'p{rng.randint(0, 99999):05d}-{i}',
+            'title': f'Listing {i}',
+            'location': rng.choice(['Den Haag, Centrum', 'Rijswijk', 'Café Straße']),
+            'price': rng.choice([f'€{rng.randint(1, 8) * 25}.000 k.k.', 'Op aanvraag']),
+            'bedrooms': rng.choice([1, 2, 3, 4, 'x', None]),
+            'bathrooms': rng.randint(1, 3),
+            'energyLabel': rng.choice(['A', 'B', None]),
+            'status': rng.choice(['new', 'available']),
+            'created_at': f'2025-0{rng.randint(1, 3)}-01T00:00:00',
+            'version': 1,
+        }
+        if rng.random() < 0.9:
+            p['area'] = rng.choice([40, 41.5, 42])
+        properties.append(normalize_property(p))
+    return properties
+
+
+@pytest.fixture
+def make_properties():
+    return generate_properties
+
+
+@pytest.fixture
+def shipped_properties():
+    with open(SHIPPED_CATALOG) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The Flask app, serving a copy of the shipped catalog.
+
+    routes/properties.py opens data/properties.json relative to the working
+    directory, so the app is imported from a scratch directory holding it.
+    """
+    workdir = tmp_path_factory.mktemp('app')
+    os.makedirs(workdir / 'data')
+    shutil.copy(SHIPPED_CATALOG, workdir / 'data' / 'properties.json')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import main
+        yield main.app
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app):
+    """Test client with the catalog reset to the shipped listings"""
+    from routes.properties import catalog
+    with open(SHIPPED_CATALOG) as f:
+        catalog.save(json.load(f))
+    return app.test_client()
@@ -0,0 +1,86 @@
+import gc
+import psycopg2
+import pytest
+from services.circuit_breaker import CircuitBreaker, CLOSED, OPEN
+from services.db_pool import ConnectionPool, DatabaseUnavailable, PoolTimeout, close_connection
+
+
+@pytest.fixture
+def pool(database):
+    # Idle connections are never health-checked, as in a busy pool
+    return ConnectionPool('fake', minconn=1, maxconn=1, health_check_idle=3600, checkout_timeout=0.05,
+                          connect=database.connect,
+                          breaker=CircuitBreaker('test', failure_threshold=3, reset_timeout=30))
+
+
+def run_statement(pool, database, fail):
+    conn = pool.getconn()
+    if fail:
+        database.connections[0].time_out_next()
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT 1')
+    except psycopg2.OperationalError:
+        pass
+    finally:
+        close_connection(conn, cur)
+
+
+def test_successful_statements_reset_the_failure_count(pool, database):
+    # Timeouts separated by successful statements are not consecutive
+    for _ in range(10):
+        run_statement(pool, database, fail=True)
+        run_statement(pool, database, fail=True)
+        run_statement(pool, database, fail=False)
+    stats = pool.breaker.stats()
+    assert stats['state'] == CLOSED
+    assert stats['consecutive_failures'] == 0
+    assert stats['failures'] == 20
+    assert len(database.connections) == 1
+
+
+def test_consecutive_statement_failures_open_the_circuit(pool, database):
+    run_statement(pool, database, fail=False)
+    for _ in range(3):
+        run_statement(pool, database, fail=True)
+    assert pool.breaker.state == OPEN
+    with pytest.raises(DatabaseUnavailable):
+        pool.getconn()
+
+
+def route(pool):
+    """The shape of the routes in routes/user.py and routes/contact.py"""
+    conn = pool.getconn()
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute('SELECT 1')
+        return 'ok'
+    except Exception:
+        conn.rollback()
+        return 'error'
+    finally:
+        close_connection(conn, cur)
+
+
+def test_failed_cursor_returns_the_slot(pool, database):
+    database.connections[0].cursor_error = psycopg2.InterfaceError('connection already closed')
+    for _ in range(3):
+        assert route(pool) == 'error'
+    database.connections[0].cursor_error = None
+    assert route(pool) == 'ok'
+    assert pool.stats()['in_use'] == 0
+
+
+def test_unclosed_connection_is_reclaimed(pool, database):
+    conn = pool.getconn()
+    conn.cursor()
+    del conn
+    gc.collect()
+    # The only slot comes back instead of the checkout timing out
+    conn = pool.getconn()
+    assert pool.stats()['reclaimed'] == 1
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    conn.close()
+    assert pool.stats()['in_use'] == 0
@@ -0,0 +1,29 @@
+from services.geo_index import GeoIndex, parse_geo, page_by_distance
+
+
+def test_shipped_listings_have_coordinates(shipped_properties):
+    index = GeoIndex()
+    properties = shipped_properties
+    index.reset(properties)
+    assert index.stats()['points'] == len(properties)
+
+
+def test_radius_query_over_the_shipped_catalog(shipped_properties):
+    index = GeoIndex()
+    properties = shipped_properties
+    index.reset(properties)
+    # Around Den Haag Centraal
+    distances = index.search(parse_geo({'lat': '52.0808', 'lon': '4.3250', 'radius_km': '3'}))
+    assert set(distances) == {p['id'] for p in properties}
+    nearest, total, has_more = page_by_distance(properties, distances, 2)
+    assert [p['id'] for p in nearest] == ['groenewegje-76', 'westeinde-11-d']
+    assert (total, has_more) == (3, True)
+    # A small radius around one listing finds only that one
+    assert list(index.search(parse_geo({'lat': 52.0678, 'lon': 4.2958, 'radius_km': 0.1}))) == ['jacob-schorerlaan-201']
+
+
+def test_bbox_excludes_listings_outside(shipped_properties):
+    index = GeoIndex()
+    index.reset(shipped_properties)
+    distances = index.search(parse_geo({'bbox': '52.07,4.30,52.08,4.32'}))
+    assert distances == {'groenewegje-76': None, 'westeinde-11-d': None}
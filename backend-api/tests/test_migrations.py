@@ -0,0 +1,59 @@
+import psycopg2
+import pytest
+from services.migrations import LATEST_VERSION, MIGRATIONS, Migration, apply_migrations, current_version
+
+
+@pytest.fixture
+def conn(database):
+    return database.connect()
+
+
+def test_fresh_database_gets_every_migration(database, conn):
+    assert current_version(conn) == 0
+    assert apply_migrations(conn) == [m.version for m in MIGRATIONS]
+    assert database.schema_versions == [m.version for m in MIGRATIONS]
+    # The migration lock is released again
+    assert conn.executed[-1] == 'SELECT pg_advisory_unlock(%s)'
+    assert current_version(conn) == LATEST_VERSION
+
+
+def test_current_schema_costs_one_query(database, conn):
+    apply_migrations(conn)
+    conn = database.connect()
+    assert apply_migrations(conn) == []
+    assert conn.executed == ['SELECT max(version) AS version FROM schema_version']
+
+
+def test_only_newer_migrations_run(database, conn):
+    database.schema_versions = [1, 2]
+    assert apply_migrations(conn) == [3, 4]
+    assert database.schema_versions == [1, 2, 3, 4]
+
+
+def test_failed_transactional_migration_is_not_recorded(database, conn):
+    migrations = (
+        Migration(1, 'first', ('CREATE TABLE first (id INTEGER)',), False),
+        Migration(2, 'second', ('CREATE TABLE second (id INTEGER)', 'ALTER TABLE second ADD broken'), False),
+        Migration(3, 'third', ('CREATE TABLE third (id INTEGER)',), False),
+    )
+    database.errors['ALTER TABLE second ADD broken'] = psycopg2.ProgrammingError('syntax error')
+    with pytest.raises(psycopg2.ProgrammingError):
+        apply_migrations(conn, migrations)
+    assert database.schema_versions == [1]
+    assert 'CREATE TABLE third (id INTEGER)' not in conn.executed
+    assert conn.executed[-1] == 'SELECT pg_advisory_unlock(%s)'
+    # The next start picks up where this one stopped
+    del database.errors['ALTER TABLE second ADD broken']
+    assert apply_migrations(database.connect(), migrations) == [2, 3]
+
+
+def test_invalid_index_from_an_interrupted_build_is_rebuilt(database, conn):
+    migrations = (Migration(1, 'indexes', (
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON a (x)',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON b (y)',
+    ), True),)
+    database.invalid_indexes.add('idx_b')
+    assert apply_migrations(conn, migrations) == [1]
+    assert 'DROP INDEX CONCURRENTLY IF EXISTS idx_a' not in conn.executed
+    drop = conn.executed.index('DROP INDEX CONCURRENTLY IF EXISTS idx_b')
+    assert conn.executed[drop + 1] == 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON b (y)'
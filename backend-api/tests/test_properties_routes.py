@@ -0,0 +1,108 @@
+import json
+import pytest
+
+PROPERTIES_URL = '/api/properties/properties'
+
+
+@pytest.mark.parametrize('query', ['limit=abc', 'limit=-5', 'limit=0', 'limit=1.5', 'cursor=zzz', 'limit=1&cursor=zzz'])
+def test_invalid_page_arguments_are_rejected(client, query):
+    response = client.get(f'{PROPERTIES_URL}?{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_cursor_pages_cover_the_catalog(client):
+    everything = client.get(f'{PROPERTIES_URL}?sort_by=price_asc').get_json()
+    ids, cursor = [], None
+    while True:
+        query = 'sort_by=price_asc&limit=1' + (f'&cursor={cursor}' if cursor else '')
+        body = client.get(f'{PROPERTIES_URL}?{query}').get_json()
+        assert body['total'] == everything['total']
+        ids.extend(p['id'] for p in body['properties'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert ids == [p['id'] for p in everything['properties']]
+    # A cursor made for another sort order is refused
+    first = client.get(f'{PROPERTIES_URL}?sort_by=price_asc&limit=1').get_json()
+    response = client.get(f"{PROPERTIES_URL}?sort_by=newest&limit=1&cursor={first['next_cursor']}")
+    assert response.status_code == 400
+
+
+def test_matching_etag_gets_304_until_the_catalog_changes(client):
+    first = client.get(f'{PROPERTIES_URL}?sort_by=price_asc')
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified']
+    response = client.get(f'{PROPERTIES_URL}?sort_by=price_asc', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    # The same filters in another order are the same request
+    one = client.get(f'{PROPERTIES_URL}?status=available&sort_by=newest').headers['ETag']
+    assert client.get(f'{PROPERTIES_URL}?sort_by=newest&status=available').headers['ETag'] == one
+
+    listing = first.get_json()['properties'][0]
+    detail = client.get(f"{PROPERTIES_URL}/{listing['id']}")
+    response = client.get(f"{PROPERTIES_URL}/{listing['id']}", headers={'If-None-Match': detail.headers['ETag']})
+    assert response.status_code == 304
+
+    assert client.put(f"{PROPERTIES_URL}/{listing['id']}", json={'rating': 5}).status_code == 200
+    response = client.get(f'{PROPERTIES_URL}?sort_by=price_asc', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    response = client.get(f"{PROPERTIES_URL}/{listing['id']}", headers={'If-None-Match': detail.headers['ETag']})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('url', [
+    f'{PROPERTIES_URL}?limit=abc',
+    f'{PROPERTIES_URL}?limit=2&cursor=zzz',
+    f'{PROPERTIES_URL}?min_price=cheap',
+    f'{PROPERTIES_URL}?sort_by=distance',
+    f'{PROPERTIES_URL}/facets?bedrooms=many',
+])
+def test_invalid_arguments_are_rejected_before_the_etag_check(client, url):
+    response = client.get(url, headers={'If-None-Match': '*'})
+    assert response.status_code == 400
+
+
+def test_search_rejects_invalid_arguments(client):
+    for body in ({'query': 'den haag', 'sort_by': 'price'}, {'query': 'den haag', 'limit': -1},
+                 {'filters': {'min_price': 'cheap'}}):
+        assert client.post(f'{PROPERTIES_URL}/search', json=body).status_code == 400
+
+
+def new_listing(title, **fields):
+    listing = {'title': title, 'location': 'Den Haag, Centrum', 'price': '€300.000 k.k.', 'size': '80m²',
+               'bedrooms': 2, 'bathrooms': 1, 'area': 80, 'description': 'Test listing'}
+    listing.update(fields)
+    return listing
+
+
+def test_bulk_reports_errors_per_item(client):
+    existing = client.get(PROPERTIES_URL).get_json()['properties'][0]
+    items = [
+        new_listing('Bulkstraat 1'),
+        {'title': 'Bulkstraat 2'},
+        new_listing('Bulkstraat 3', latitude=95, longitude=4.3),
+        new_listing(['Bulkstraat', 4]),
+        'not an object',
+        dict(existing, rating=1),
+    ]
+    response = client.post(f'{PROPERTIES_URL}/bulk', json=items)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['created'], body['updated'], body['failed']) == (1, 1, 4)
+    assert [r['status'] for r in body['results']] == ['created', 'error', 'error', 'error', 'error', 'updated']
+    assert body['results'][1]['error'] == 'Missing required field: location'
+    assert body['results'][3]['error'] == 'title must be a string'
+    # The valid items were saved
+    assert client.get(f'{PROPERTIES_URL}/bulkstraat-1').status_code == 200
+    assert client.get(f"{PROPERTIES_URL}/{existing['id']}").get_json()['rating'] == 1
+
+
+def test_bulk_ndjson_reports_unparseable_lines(client):
+    lines = [json.dumps(new_listing('Bulkstraat 5')), '{"title": ', json.dumps(new_listing('Bulkstraat 6'))]
+    response = client.post(f'{PROPERTIES_URL}/bulk', data='\n'.join(lines), content_type='application/x-ndjson')
+    body = response.get_json()
+    assert (body['created'], body['failed']) == (2, 1)
+    assert body['results'][1] == {'index': 1, 'status': 'error', 'error': 'Invalid JSON on line 2'}
+    assert client.post(f'{PROPERTIES_URL}/bulk', data='[1, 2', content_type='application/json').status_code == 400
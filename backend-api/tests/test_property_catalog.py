@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import pytest
+from services.property_catalog import PropertyCatalog
+from services.property_storage import JsonFileStorage
+
+
+@pytest.fixture
+def path(tmp_path, make_properties):
+    path = str(tmp_path / 'properties.json')
+    with open(path, 'w') as f:
+        json.dump(make_properties(10, seed=1), f)
+    return path
+
+
+def edit_by_hand(path, change):
+    """Rewrite the file in place, as an editor or another worker would"""
+    with open(path) as f:
+        properties = json.load(f)
+    change(properties)
+    stat = os.stat(path)
+    with open(path, 'w') as f:
+        json.dump(properties, f)
+    return stat
+
+
+def test_reads_are_served_from_memory(path):
+    catalog = PropertyCatalog(JsonFileStorage(path))
+    first = catalog.snapshot()
+    for _ in range(5):
+        assert catalog.snapshot() is first
+    stats = catalog.stats()
+    assert (stats['reloads'], stats['hits'], stats['count']) == (1, 5, 10)
+
+
+def test_changed_file_is_reloaded(path):
+    catalog = PropertyCatalog(JsonFileStorage(path))
+    catalog.snapshot()
+    edit_by_hand(path, lambda properties: properties.pop())
+    assert len(catalog.all()) == 9
+    assert catalog.stats()['reloads'] == 2
+
+
+def test_same_size_edit_is_reloaded(path):
+    catalog = PropertyCatalog(JsonFileStorage(path))
+    listing_id = catalog.all()[0]['id']
+
+    def rename(properties):
+        properties[0]['title'] = properties[0]['title'][::-1]
+
+    before = edit_by_hand(path, rename)
+    # Only the mtime tells this edit apart
+    os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns + 1000000))
+    assert os.path.getsize(path) == before.st_size
+    assert catalog.get(listing_id)['title'] == 'Listing 0'[::-1]
+    assert catalog.stats()['reloads'] == 2
+
+
+def test_writes_through_the_catalog_do_not_reload(path):
+    catalog = PropertyCatalog(JsonFileStorage(path))
+    listing_id = catalog.all()[0]['id']
+    catalog.update(listing_id, lambda p: dict(p, title='Renamed'))
+    catalog.remove(catalog.all()[1]['id'])
+    assert catalog.get(listing_id)['title'] == 'Renamed'
+    assert len(catalog.all()) == 9
+    # A second catalog over the same file sees the writes
+    assert PropertyCatalog(JsonFileStorage(path)).get(listing_id)['version'] == 2
+    assert catalog.stats()['reloads'] == 1
+
+
+def test_published_snapshots_are_never_mutated(path):
+    catalog = PropertyCatalog(JsonFileStorage(path))
+    old = catalog.snapshot()
+    ids = [p['id'] for p in old.properties]
+    first = old.by_id[ids[0]]
+    catalog.update(ids[0], lambda p: dict(p, title='Renamed'))
+    catalog.remove(ids[1])
+    assert [p['id'] for p in old.properties] == ids
+    assert old.by_id[ids[0]] is first and first['title'] == 'Listing 0'
+    new = catalog.snapshot()
+    assert new is not old and new.version > old.version
+    assert ids[1] not in new.by_id
+
+
+def test_concurrent_updates_are_not_lost(path):
+    # Two catalogs over one file stand in for two workers
+    catalogs = [PropertyCatalog(JsonFileStorage(path)) for _ in range(2)]
+    listing_id = catalogs[0].all()[0]['id']
+
+    def bump(catalog):
+        for _ in range(25):
+            catalog.update(listing_id, lambda p: dict(p, bathrooms=p['bathrooms'] + 1))
+
+    start = catalogs[0].get(listing_id)['bathrooms']
+    threads = [threading.Thread(target=bump, args=(c,)) for c in catalogs for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stored = PropertyCatalog(JsonFileStorage(path)).get(listing_id)
+    assert stored['bathrooms'] == start + 100
+    assert stored['version'] == 101
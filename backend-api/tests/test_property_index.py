@@ -0,0 +1,88 @@
+import pytest
+import services.property_index as property_index
+from services.property_criteria import parse_criteria
+from services.property_index import (
+    ColumnarIndex, CursorError, decode_cursor, encode_cursor, filter_many, filter_properties,
+    filter_properties_python, page_properties_python
+)
+
+SORT_ORDERS = ('price_asc', 'price_desc', 'area_asc', 'area_desc', 'newest', None)
+
+FILTERS = (
+    {},
+    {'status': 'available'},
+    {'min_price': 100000, 'max_price': 150000},
+    {'location': 'straße', 'bedrooms': 2},
+    {'energy_label': 'A', 'bathrooms': 2},
+)
+
+
+def test_cursor_round_trip():
+    listing = {'id': 'westeinde-11-d', 'price_eur': 525000, 'area': 95, 'created_at': '2025-01-01T00:00:00'}
+    for sort_by, value in (('price_asc', 525000), ('area_desc', 95), ('newest', '2025-01-01T00:00:00')):
+        assert decode_cursor(encode_cursor(sort_by, listing), sort_by) == (value, 'westeinde-11-d')
+    # Listings without an area sort last; their cursor carries None
+    assert decode_cursor(encode_cursor('area_asc', {'id': 'x'}), 'area_asc') == (None, 'x')
+
+
+@pytest.mark.parametrize('cursor', ['zzz', '', 'eyJzIjoibmV3ZXN0In0', encode_cursor('price_asc', {'id': 'x'})[:-3]])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, 'price_asc')
+
+
+def test_cursor_belongs_to_its_sort_order():
+    cursor = encode_cursor('newest', {'id': 'x', 'created_at': '2025-01-01'})
+    with pytest.raises(CursorError, match='sort_by'):
+        decode_cursor(cursor, 'price_asc')
+
+
+def test_deep_pages_continue_where_the_previous_page_ended(make_properties):
+    properties = make_properties(300, seed=9)
+    index = ColumnarIndex(properties)
+    criteria = parse_criteria({'status': 'available'})
+    expected = [p['id'] for p in page_properties_python(properties, criteria, 'price_desc', 1000)[0]]
+    seen, after = [], None
+    while True:
+        page, total, has_more = index.page(criteria, 'price_desc', 7, after)
+        assert total == len(expected)
+        seen.extend(p['id'] for p in page)
+        if not has_more:
+            break
+        after = decode_cursor(encode_cursor('price_desc', page[-1]), 'price_desc')
+    assert seen == expected
+
+
+def test_columnar_index_matches_the_python_path(make_properties):
+    properties = make_properties(500, seed=4)
+    index = ColumnarIndex(properties)
+    for filters in FILTERS:
+        criteria = parse_criteria(filters)
+        for sort_by in SORT_ORDERS:
+            expected = filter_properties_python(properties, criteria, sort_by)
+            assert index.select(criteria, sort_by) == expected
+            # Top rows via argpartition keep the stable sort's tie order
+            assert index.select(criteria, sort_by, limit=13) == expected[:13]
+        candidates = {p['id'] for p in properties[::3]}
+        assert index.select(criteria, 'price_asc', candidates) == \
+            filter_properties_python(properties, criteria, 'price_asc', candidates)
+
+
+def test_missing_areas_sort_last_both_ways():
+    properties = [{'id': 'a', 'area': 50}, {'id': 'b'}, {'id': 'c', 'area': 'n/a'}, {'id': 'd', 'area': 70}]
+    index = ColumnarIndex(properties)
+    criteria = parse_criteria({})
+    for sort_by, expected in (('area_asc', ['a', 'd', 'b', 'c']), ('area_desc', ['d', 'a', 'b', 'c'])):
+        assert [p['id'] for p in index.select(criteria, sort_by)] == expected
+        assert [p['id'] for p in filter_properties_python(properties, criteria, sort_by)] == expected
+
+
+def test_switch_falls_back_to_the_python_path(make_properties, monkeypatch):
+    properties = make_properties(50, seed=6)
+    criteria = [parse_criteria(f) for f in FILTERS]
+    expected = [filter_properties(properties, c, 'newest') for c in criteria]
+    assert filter_many(properties, criteria, 'newest') == expected
+    monkeypatch.setattr(property_index, 'USE_COLUMNAR_INDEX', False)
+    monkeypatch.setattr(property_index, 'ColumnarIndex', None)
+    assert [filter_properties(properties, c, 'newest') for c in criteria] == expected
+    assert filter_many(properties, criteria, 'newest') == expected
@@ -0,0 +1,60 @@
+import json
+import os
+from services.property_catalog import PropertyCatalog
+from services.property_storage import JournalStorage
+
+
+def test_journal_replays_on_top_of_the_snapshot(tmp_path, make_properties):
+    path = str(tmp_path / 'properties.json')
+    properties = make_properties(5, seed=2)
+    storage = JournalStorage(path, fsync=False)
+    storage.save_all(properties[:3])
+    storage.record_upserts(properties[3:], properties)
+    storage.record_upsert(dict(properties[0], title='Renamed'), properties)
+    storage.record_delete(properties[1]['id'], properties)
+    # A crash mid-append leaves a torn final line
+    with open(storage.journal_path, 'a') as f:
+        f.write('{"op": "upsert", "prop')
+
+    reopened = JournalStorage(path)
+    loaded = reopened.load()
+    assert [p['id'] for p in loaded] == [properties[i]['id'] for i in (0, 2, 3, 4)]
+    assert loaded[0]['title'] == 'Renamed'
+    assert reopened.version == 5
+    with open(path) as f:
+        assert len(json.load(f)) == 3
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path, make_properties):
+    path = str(tmp_path / 'properties.json')
+    storage = JournalStorage(path, compact_bytes=2000, fsync=False)
+    catalog = PropertyCatalog(storage)
+    for p in make_properties(8, seed=7):
+        catalog.add(p)
+    listing_id = catalog.all()[0]['id']
+    catalog.update(listing_id, lambda p: dict(p, title='Renamed'))
+    storage._compaction_thread.join()
+
+    assert storage.compactions >= 1
+    assert not os.path.exists(storage.compacting_path)
+    with open(path) as f:
+        snapshot = {p['id']: p for p in json.load(f)}
+    # Records appended after the last compaction are still in the journal
+    state = JournalStorage(path).load()
+    assert {p['id'] for p in state} == {p['id'] for p in catalog.all()}
+    assert set(snapshot) <= {p['id'] for p in state}
+    assert [p for p in state if p['id'] == listing_id][0]['title'] == 'Renamed'
+    # The catalog accepts its own compaction without reloading
+    reloads = catalog.stats()['reloads']
+    catalog.snapshot()
+    assert catalog.stats()['reloads'] == reloads
+
+
+def test_save_all_replaces_snapshot_and_journal(tmp_path, make_properties):
+    path = str(tmp_path / 'properties.json')
+    properties = make_properties(4, seed=8)
+    storage = JournalStorage(path, fsync=False)
+    storage.record_upserts(properties, properties)
+    storage.save_all(properties[:2])
+    assert not os.path.exists(storage.journal_path)
+    assert JournalStorage(path).load() == properties[:2]
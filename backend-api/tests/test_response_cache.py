@@ -0,0 +1,37 @@
+from services.response_cache import ResponseCache
+
+PROPERTIES_URL = '/api/properties/properties'
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2, max_bytes=100)
+    cache.put('a', 'A', 10)
+    cache.put('b', 'B', 10)
+    assert cache.get('a') == 'A'
+    cache.put('c', 'C', 10)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('A', 'C')
+    # The byte budget evicts as well; bodies over it are never stored
+    cache.put('d', 'D', 85)
+    assert cache.get('a') is None
+    cache.put('e', 'E', 101)
+    assert cache.get('e') is None
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (2, 95, 2)
+    assert (stats['hits'], stats['misses']) == (3, 3)
+
+
+def test_writes_invalidate_cached_responses(client):
+    from routes.properties import response_cache
+
+    url = f'{PROPERTIES_URL}?status=available&sort_by=price_asc'
+    first = client.get(url).get_json()
+    hits = response_cache.stats()['hits']
+    assert client.get(url).get_json() == first
+    assert response_cache.stats()['hits'] == hits + 1
+
+    listing = first['properties'][0]
+    assert client.put(f"{PROPERTIES_URL}/{listing['id']}", json={'status': 'sold'}).status_code == 200
+    assert response_cache.stats()['entries'] == 0
+    ids = [p['id'] for p in client.get(url).get_json()['properties']]
+    assert listing['id'] not in ids
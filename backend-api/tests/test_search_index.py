@@ -0,0 +1,64 @@
+import pytest
+from services.autocomplete import AutocompleteIndex
+from services.search_index import SearchIndex
+
+
+@pytest.fixture
+def search_index(shipped_properties):
+    index = SearchIndex()
+    index.reset(shipped_properties)
+    return index
+
+
+@pytest.fixture
+def autocomplete(shipped_properties):
+    index = AutocompleteIndex()
+    index.reset(shipped_properties)
+    return index
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('schorerlaan', 'jacob-schorerlaan-201'),
+    ('schorelaan', 'jacob-schorerlaan-201'),
+    ('groenwegje', 'groenewegje-76'),
+    ('westeinde', 'westeinde-11-d'),
+])
+def test_misspelled_streets_are_found(search_index, query, expected):
+    assert list(search_index.search(query)) == [expected]
+
+
+def test_unrelated_words_match_nothing(search_index):
+    assert search_index.search('xyzzyq') == {}
+    assert search_index.search('de het') is None
+
+
+def test_fuzzy_matches_follow_writes(search_index, shipped_properties):
+    search_index.upsert(dict(shipped_properties[0], id='new', title='Laan van Meerdervoort 12'))
+    assert 'new' in search_index.search('meerdevoort')
+    search_index.remove('new')
+    assert search_index.search('meerdevoort') == {}
+
+
+def test_autocomplete_finds_any_word_of_a_suggestion(autocomplete):
+    assert autocomplete.complete('schor') == [{'text': 'Jacob Schorerlaan', 'type': 'street', 'count': 1}]
+    assert [s['text'] for s in autocomplete.complete('CEN')] == ['Centrum', 'Den Haag, Centrum']
+    assert autocomplete.complete('gro', limit=1) == [{'text': 'Groenewegje', 'type': 'street', 'count': 1}]
+    assert autocomplete.complete('') == []
+    assert autocomplete.complete('qq') == []
+
+
+def test_autocomplete_counts_follow_writes(autocomplete, shipped_properties):
+    assert autocomplete.complete('centrum', limit=1)[0]['count'] == 2
+    autocomplete.remove('westeinde-11-d')
+    assert autocomplete.complete('centrum', limit=1)[0]['count'] == 1
+    autocomplete.upsert(dict(shipped_properties[0], id='new', title='Prinsegracht 3'))
+    assert autocomplete.complete('prinse') == [{'text': 'Prinsegracht', 'type': 'street', 'count': 1}]
+    autocomplete.remove('new')
+    assert autocomplete.complete('prinse') == []
+
+
+def test_autocomplete_endpoint(client):
+    response = client.get('/api/properties/properties/autocomplete?q=groen&limit=5')
+    assert response.status_code == 200
+    assert 'Groenewegje' in [s['text'] for s in response.get_json()['suggestions']]
+    assert client.get('/api/properties/properties/autocomplete?q=groen&limit=0').status_code == 400
@@ -0,0 +1,122 @@
+import json
+import os
+import random
+import threading
+import pytest
+from services.db_pool import DB_BREAKER_FAILURE_THRESHOLD
+from services.property_criteria import parse_criteria
+from services.property_index import ColumnarIndex, page_properties_python, encode_cursor, decode_cursor
+from services.property_storage import JournalStorage
+from services.sql_storage import SqlStorage, SqliteStorage, PostgresStorage
+
+# A scratch PostgreSQL database for the postgres variant; its properties
+# table is overwritten
+TEST_DATABASE_URL = os.getenv('PROPERTIES_TEST_DATABASE_URL')
+
+SORT_ORDERS = ('price_asc', 'price_desc', 'area_asc', 'area_desc', 'newest', None)
+
+FILTERS = (
+    {},
+    {'status': 'new'},
+    {'min_price': 100000, 'location': 'centrum'},
+    {'location': 'straße', 'bedrooms': 2},
+    {'energy_label': 'B', 'bathrooms': 2, 'max_price': 150000},
+)
+
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def storage(request, tmp_path):
+    if request.param == 'sqlite':
+        return SqliteStorage(str(tmp_path / 'properties.db'), poll_seconds=0)
+    if not TEST_DATABASE_URL:
+        pytest.skip('PROPERTIES_TEST_DATABASE_URL is not set')
+    return PostgresStorage(TEST_DATABASE_URL, poll_seconds=0)
+
+
+def walk(page, limit, sort_by):
+    """Follow cursors from the first page to the last; returns (ids, totals)"""
+    ids, totals, after = [], set(), None
+    while True:
+        rows, total, has_more = page(limit, after)
+        ids.extend(p['id'] for p in rows)
+        totals.add(total)
+        if not has_more:
+            return ids, totals
+        after = decode_cursor(encode_cursor(sort_by, rows[-1]), sort_by)
+
+
+def test_python_numpy_and_sql_pages_agree(storage, make_properties):
+    properties = make_properties(600, seed=3)
+    storage.save_all(properties)
+    assert storage.load() == properties
+    index = ColumnarIndex(properties)
+    rng = random.Random(16)
+    for sort_by in SORT_ORDERS:
+        for filters in FILTERS:
+            criteria = parse_criteria(filters)
+            limit = rng.randint(1, 60)
+            expected = walk(lambda n, after: page_properties_python(properties, criteria, sort_by, n, after),
+                            limit, sort_by)
+            assert walk(lambda n, after: index.page(criteria, sort_by, n, after), limit, sort_by) == expected
+            assert walk(lambda n, after: storage.query(criteria, sort_by, n, after), limit, sort_by) == expected
+            ids, totals = expected
+            assert totals == {len(ids)}
+
+
+def test_unreachable_postgres_keeps_the_last_version():
+    # Nothing listens on port 9; once the breaker opens no connect is attempted
+    storage = PostgresStorage('postgresql://catalog@127.0.0.1:9/catalog', poll_seconds=0)
+    for _ in range(DB_BREAKER_FAILURE_THRESHOLD * 2):
+        assert storage.signature() == ('sql', 0)
+    pool = storage.stats()['pool']
+    assert pool['breaker']['state'] == 'open'
+    assert pool['connect_errors'] == DB_BREAKER_FAILURE_THRESHOLD
+
+
+def test_empty_table_imports_the_json_catalog_once(tmp_path, make_properties):
+    seed_path = str(tmp_path / 'properties.json')
+    properties = make_properties(20, seed=5)
+    with open(seed_path, 'w') as f:
+        json.dump(properties[:15], f)
+    journal = JournalStorage(seed_path)
+    journal.record_upserts(properties[15:], properties)
+    journal.record_delete(properties[0]['id'], properties)
+
+    storage = SqliteStorage(str(tmp_path / 'properties.db'), poll_seconds=0, seed_path=seed_path)
+    assert storage.exists()
+    assert storage.load() == properties[1:]
+    # Later changes to the JSON store are not imported again
+    journal.record_delete(properties[1]['id'], properties)
+    storage = SqliteStorage(str(tmp_path / 'properties.db'), poll_seconds=0, seed_path=seed_path)
+    assert storage.exists()
+    assert storage.load() == properties[1:]
+
+
+def test_empty_table_without_a_seed_stays_empty(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'properties.db'), poll_seconds=0)
+    assert not storage.exists()
+    storage = SqliteStorage(str(tmp_path / 'other.db'), poll_seconds=0,
+                            seed_path=str(tmp_path / 'missing.json'))
+    assert not storage.exists()
+    assert storage.load() == []
+
+
+def test_writer_lock_only_affects_the_holding_thread(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'properties.db'), poll_seconds=3600)
+    seen = []
+    reader = threading.Thread(target=lambda: seen.append(storage._holding_lock))
+    with storage.lock():
+        assert storage._holding_lock == 1
+        reader.start()
+        reader.join()
+    assert seen == [0]
+    assert storage._holding_lock == 0
+
+
+def test_backends_must_implement_the_connection_hooks():
+    class Incomplete(SqlStorage):
+        def _connect(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
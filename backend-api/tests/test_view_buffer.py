@@ -0,0 +1,83 @@
+import psycopg2
+import pytest
+import services.view_buffer as view_buffer
+from services.db_pool import DatabaseUnavailable
+from services.view_buffer import KnownPropertyIds, ViewBuffer, view_field_error
+
+
+def fake_execute_values(cur, sql, rows, page_size=100):
+    """property_views as seen through execute_values: a source over 50 characters is refused"""
+    if any(row[3] is not None and len(row[3]) > 50 for row in rows):
+        raise psycopg2.DataError('value too long for type character varying(50)')
+    cur.conn.pending.extend(rows)
+
+
+@pytest.fixture
+def buffer(database, monkeypatch):
+    monkeypatch.setattr(view_buffer, 'get_db_connection', database.connect)
+    monkeypatch.setattr(view_buffer, 'execute_values', fake_execute_values)
+    # The flush thread only wakes up for a full batch; tests flush by hand
+    buffer = ViewBuffer(max_size=10, batch_size=100, interval=3600)
+    yield buffer
+    buffer.close()
+
+
+def view(property_id, source=None):
+    return (None, property_id, '2025-01-01T00:00:00', source, None)
+
+
+def test_refused_rows_are_dropped_and_the_rest_written(database, buffer):
+    for property_id in range(5):
+        assert buffer.offer(view(property_id, 'x' * 60 if property_id == 2 else 'web'))
+    assert buffer.flush()
+    assert [row[1] for row in database.rows] == [0, 1, 3, 4]
+    stats = buffer.stats()
+    assert (stats['pending'], stats['written'], stats['invalid']) == (0, 4, 1)
+    # The queue keeps working afterwards
+    assert buffer.offer(view(5))
+    assert buffer.flush()
+    assert database.rows[-1][1] == 5
+
+
+def test_unreachable_database_requeues_within_max_size(database, buffer):
+    database.down = True
+    for property_id in range(6):
+        assert buffer.offer(view(property_id))
+    with buffer._cond:
+        batch = [buffer._rows.popleft() for _ in range(6)]
+    # Views queued while the failed batch was being written
+    for property_id in range(6, 14):
+        assert buffer.offer(view(property_id))
+    assert not buffer._write(batch)
+    buffer._requeue(batch)
+    stats = buffer.stats()
+    assert (stats['pending'], stats['dropped']) == (10, 4)
+    database.down = False
+    assert buffer.flush()
+    assert [row[1] for row in database.rows] == [0, 1] + list(range(6, 14))
+
+
+def test_view_field_error():
+    assert view_field_error('web', 'abc') is None
+    assert view_field_error(None, None) is None
+    assert view_field_error('x' * 51, None) == 'source must be at most 50 characters'
+    assert view_field_error(None, 'x' * 101) == 'session_id must be at most 100 characters'
+    assert view_field_error(7, None) == 'source must be a string'
+
+
+def test_known_ids_keep_serving_the_last_set_when_a_reload_fails(monkeypatch):
+    calls = []
+
+    def unavailable():
+        calls.append(1)
+        raise DatabaseUnavailable(30)
+
+    known = KnownPropertyIds()
+    known._ids = {1, 2}
+    known._loaded_at = -1e9
+    monkeypatch.setattr(view_buffer, 'get_db_connection', unavailable)
+    assert known.contains(1) is True
+    assert known.contains(3) is False
+    # The failed attempt is not repeated before KNOWN_IDS_MISS_REFRESH_SECONDS
+    assert known.contains(1) is True
+    assert len(calls) == 1